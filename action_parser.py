@@ -0,0 +1,153 @@
+# action_parser.py
+# 모델 출력 한 턴에서 Answer / Action 을 찾는 파서 (baseline / enhanced 공통).
+# 줄 단위로 나누거나 lower() 복사본을 만들지 않고, 미리 컴파일한 패턴으로 원문을 바로 훑는다.
+# - "Answer:" 가 있으면 그 뒤 전체가 최종 답 (Action 보다 우선, 기존 동작과 동일)
+# - 줄 맨 앞의 "Action:" (대소문자 무시) 마다 name("arg", 'arg', ...) 호출 하나
+#   인자는 여러 줄에 걸칠 수 있고 \" \' \\ escape 를 지원한다.
+#   escape 하지 않은 같은 종류의 따옴표도 바로 뒤가 , 나 ) 가 아니면 인자 내용으로 본다.
+# - 첫 Action 부터 연속된 Action 줄(빈 줄은 건너뜀)을 모두 반환해서 호출하는 쪽이 병렬로 실행할 수 있게 한다.
+#   Action 이 아닌 줄(보통 모델이 지어낸 Observation:)이 나오면 그 뒤의 Action 은 보지 않는다 (StreamCutter 와 같은 규칙).
+
+import re
+
+# 패턴이 리터럴("\n")로 시작해야 re 엔진이 prefix 검색으로 빠르게 건너뛴다 (^ + re.M 보다 10배 이상 빠름).
+# 첫 줄은 앞에 개행이 없으므로 _FIRST_ACTION_RE 로 따로 확인한다.
+_ACTION_RE = re.compile(r"\n[ \t]*(?i:action):")
+_FIRST_ACTION_RE = re.compile(r"[ \t]*(?i:action):")
+# 개행 위치에서: 빈 줄들을 건너뛴 다음 줄이 Action: 인지
+_NEXT_ACTION_RE = re.compile(r"\n(?:[ \t]*\n)*[ \t]*(?i:action):")
+_NAME_RE = re.compile(r"[ \t]*([A-Za-z_]\w*)[ \t]*\(\s*")
+# 따옴표 문자열 하나 + 뒤따르는 구분자(, 또는 )).
+# 일반 문자 구간을 [^"\\]* 로 한 번에 먹고 escape / 내부 따옴표만 따로 처리 (unrolled loop)
+_ARG_RE = re.compile(
+    r"""(?:"([^"\\]*(?:(?:\\.|"(?!\s*[,)]))[^"\\]*)*)"|'([^'\\]*(?:(?:\\.|'(?!\s*[,)]))[^'\\]*)*)')\s*(,)?\s*(\))?""",
+    re.S,
+)
+_UNESCAPE_RE = re.compile(r"""\\(["'\\])""")
+
+
+def _unescape(s):
+    if "\\" not in s:
+        return s
+    return _UNESCAPE_RE.sub(r"\1", s)
+
+
+def parse_call(text, pos=0):
+    # text[pos:] 에서 name(args) 하나를 읽어 (name, args, end) 반환. 형식이 맞지 않으면 None
+    m = _NAME_RE.match(text, pos)
+    if m is None:
+        return None
+    name = m.group(1)
+    pos = m.end()
+    args = []
+    if text.startswith(")", pos):
+        return name, args, pos + 1
+    while True:
+        a = _ARG_RE.match(text, pos)
+        if a is None:
+            return None
+        raw, raw_single, comma, close = a.groups()
+        args.append(_unescape(raw if raw is not None else raw_single))
+        if close:
+            # 마지막 인자 뒤의 trailing comma 도 허용
+            return name, args, a.end()
+        if not comma:
+            return None
+        pos = a.end()
+
+
+def parse_turn(text, registry):
+    # {"answer": str 또는 None, "actions": [{"tool", "input"}, ...], "invalid": 파싱 실패한 Action 수}
+    i = text.find("Answer:")
+    if i >= 0:
+        # Answer가 있으면 Action은 보지 않는다
+        return {"answer": text[i + 7:].strip(), "actions": [], "invalid": 0}
+
+    actions = []
+    invalid = 0
+    m = _FIRST_ACTION_RE.match(text) or _ACTION_RE.search(text)
+    while m is not None:
+        pos = m.end()
+        call = parse_call(text, pos)
+        spec = registry.bind(call[0], call[1]) if call is not None else None
+        if spec is None:
+            invalid += 1
+        else:
+            actions.append(spec)
+            pos = call[2]
+        nl = text.find("\n", pos)
+        if nl < 0:
+            break
+        m = _NEXT_ACTION_RE.match(text, nl)
+    return {"answer": None, "actions": actions, "invalid": invalid}
+
+
+_ANSWER_STOP_RE = re.compile(r"[ \t]*(?:Observation:|(?i:action):)")
+
+
+def _after_answer_stop(text, start, end):
+    # Answer 뒤의 줄 text[start:end] 가 모델이 이어서 지어낸 Observation / Action 인지
+    return _ANSWER_STOP_RE.match(text, start, end) is not None
+
+
+class StreamCutter:
+    # streaming 출력에서 한 턴이 끝났는지 판단한다. feed()가 정수를 반환하면 text[:그 위치]까지가 이번 턴.
+    # - Answer: 가 나오면 여러 줄 답을 그대로 받고, 그 뒤에 Observation: / Action: 으로 시작하는 줄이 오면 그 줄 앞에서 종료
+    #   (non-streaming 경로처럼 Answer: 뒤 전체가 최종 답. API의 stop sequence \nObservation: 과 같은 지점)
+    # - 완성된 Action 뒤에 Action 이 아닌 줄(보통 모델이 지어낸 Observation:)이 시작되면 그 줄 앞에서 종료
+    #   (연속된 Action 줄은 다중 Action 으로 함께 받는다)
+    def __init__(self):
+        self.text = ""
+        self._line = 0
+        self._pending = None
+        self._last_action_end = None
+        self._answer = False
+
+    def feed(self, chunk):
+        self.text += chunk
+        text = self.text
+        while True:
+            nl = text.find("\n", self._line)
+            if nl < 0:
+                return self._check_partial()
+            start = self._line
+            self._line = nl + 1
+            if self._answer:
+                if _after_answer_stop(text, start, nl):
+                    return start
+                continue
+            if text.find("Answer:", start, nl) >= 0:
+                self._answer = True
+                continue
+            if self._pending is not None:
+                # 여러 줄에 걸친 Action 인자: 닫는 괄호가 나올 때까지 다음 줄을 기다린다
+                call = parse_call(text, self._pending)
+                if call is not None:
+                    self._pending = None
+                    self._last_action_end = call[2]
+                continue
+            m = _FIRST_ACTION_RE.match(text, start)
+            if m is not None:
+                call = parse_call(text, m.end())
+                if call is None:
+                    self._pending = m.end()
+                else:
+                    self._last_action_end = call[2]
+                continue
+            if self._last_action_end is not None and text[start:nl].strip():
+                return start
+
+    def _check_partial(self):
+        if self._answer:
+            return self._line if _after_answer_stop(self.text, self._line, len(self.text)) else None
+        # 완성된 Action 뒤의 줄이 아직 끝나지 않았어도 "Action:" 으로 시작할 수 없다는 게 보이면 바로 끊는다
+        if self._last_action_end is None or self._pending is not None:
+            return None
+        head = self.text[self._line:].lstrip(" \t")[:7].lower()
+        if head and not "action:".startswith(head):
+            return self._line
+        return None
+
+    def finish(self):
+        # stream이 끝까지 온 경우 (Answer 뒤 stop 줄이 없었거나 stop sequence로 서버가 멈춤): 전체가 이번 턴
+        return len(self.text)
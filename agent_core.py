@@ -0,0 +1,473 @@
+# agent_core.py
+
+import os
+import threading
+import time
+from pathlib import Path
+
+from action_parser import StreamCutter, parse_turn
+from metrics import StepMetrics, approx_tokens
+from prompt_templates import build_react_prompt
+from scheduler import Speculation
+from tool_registry import REGISTRY
+from traj_sink import PerTaskJsonSink
+
+# streaming 모드에서 서버 쪽에서도 멈추도록 넘기는 stop sequence
+STREAM_STOP_SEQUENCES = ["\nObservation:"]
+# stop 파라미터를 받지 않는 reasoning 모델 (이름 접두어). 목록에 없는 모델이 거부하면 첫 400 응답 후 stop 없이 다시 보낸다.
+# stop 없이도 StreamCutter가 클라이언트 쪽에서 끊으므로 결과는 같다.
+NO_STOP_MODEL_PREFIXES = ("o1", "o3", "o4", "gpt-5")
+
+# mock streaming: 4글자씩 2ms 간격으로 내보내고, 뒤에 모델이 지어낸 것 같은 내용을 붙인다
+MOCK_STREAM_CHUNK_CHARS = 4
+MOCK_STREAM_CHUNK_DELAY = 0.002
+MOCK_STREAM_TAIL = (
+    "\nObservation: {\"note\": \"invented by the model\"}\n"
+    "Thought: The tool output above looks complete, so I can finish now.\n"
+    "Answer: invented answer that must be discarded.\n"
+)
+
+
+def observation_has_error(observation):
+    # 여러 Action을 한 번에 실행한 step은 observation이 리스트
+    if isinstance(observation, list):
+        return any(observation_has_error(o) for o in observation)
+    return isinstance(observation, dict) and "error" in observation
+
+
+class AgentCore:
+    # baseline / enhanced 공통 ReAct 루프.
+    # 모드별 차이는 retrieve_rules / build_prompt / _should_reflect / _reflect / on_reflection 훅으로만 표현한다.
+    mock_answer = "mock answer"
+
+    def __init__(
+        self,
+        mode="baseline",
+        max_steps=8,
+        max_reflections=2,
+        model_name="gpt-4o-mini",
+        api_key=None,
+        mock=False,
+        runs_dir="runs",
+        sink=None,
+        temperature=None,
+        stream=False,
+        speculate=False,
+    ):
+        self.mode = mode
+        self.max_steps = max_steps
+        self.max_reflections = max_reflections
+        self.model_name = model_name
+        self.temperature = temperature
+        self.stream = stream
+        self._send_stop = not model_name.startswith(NO_STOP_MODEL_PREFIXES)
+        self.speculate = speculate
+        self.mock = mock
+        self.runs_dir = runs_dir
+        self.sink = sink if sink is not None else PerTaskJsonSink(runs_dir)
+        self.tools = REGISTRY
+        # 현재 step의 StepMetrics. 훅에서 self.phase("bank") 등으로 시간을 기록할 수 있다.
+        # 한 agent로 여러 trajectory를 동시에 돌릴 수 있도록 스레드별로 따로 둔다.
+        self._local = threading.local()
+
+        if not self.mock:
+            if api_key is None:
+                api_key = os.getenv("OPENAI_API_KEY")
+            if not api_key:
+                raise RuntimeError("OpenAI API key is required unless mock mode is enabled.")
+            # openai 패키지는 import가 무거워 실제 API를 쓸 때만 가져온다
+            from openai import OpenAI
+
+            self.client = OpenAI(api_key=api_key)
+        else:
+            self.client = None
+
+    @property
+    def step_metrics(self):
+        return getattr(self._local, "step_metrics", None)
+
+    @step_metrics.setter
+    def step_metrics(self, value):
+        self._local.step_metrics = value
+
+    def _messages(self, prompt):
+        return [
+            {"role": "system", "content": "You are a helpful reasoning agent that uses tools via ReAct."},
+            {"role": "user", "content": prompt},
+        ]
+
+    def _sampling_kwargs(self):
+        kwargs = {}
+        if self.temperature is not None:
+            kwargs["temperature"] = self.temperature
+        return kwargs
+
+    def call_model(self, prompt):
+        if self.stream:
+            return self._call_model_stream(prompt)
+
+        if self.mock:
+            text = self._mock_completion(prompt)
+            self._record_usage(approx_tokens(prompt), approx_tokens(text), estimated=True)
+            return text
+
+        resp = self.client.chat.completions.create(
+            model=self.model_name,
+            messages=self._messages(prompt),
+            **self._sampling_kwargs()
+        )
+        text = resp.choices[0].message.content
+        usage = getattr(resp, "usage", None)
+        if usage is not None:
+            self._record_usage(usage.prompt_tokens, usage.completion_tokens)
+        else:
+            self._record_usage(approx_tokens(prompt), approx_tokens(text), estimated=True)
+        return text
+
+    # ---- streaming ----
+
+    def _call_model_stream(self, prompt):
+        # 토큰을 받는 대로 StreamCutter에 넣고, Action / Answer 줄이 완성되면 stream을 닫는다.
+        # 모델이 그 뒤에 지어내는 Observation / 다음 step은 받지 않는다.
+        cutter = StreamCutter()
+        chunks = self._mock_stream(prompt) if self.mock else self._api_stream(prompt)
+        t0 = time.perf_counter()
+        first_ms = None
+        cut = None
+        usage = None
+        try:
+            for delta, chunk_usage in chunks:
+                if chunk_usage is not None:
+                    usage = chunk_usage
+                if not delta:
+                    continue
+                if first_ms is None:
+                    first_ms = round((time.perf_counter() - t0) * 1000.0, 3)
+                cut = cutter.feed(delta)
+                if cut is not None:
+                    break
+        finally:
+            chunks.close()
+
+        received = len(cutter.text)
+        if cut is None:
+            cut = cutter.finish()
+        text = cutter.text[:cut].rstrip()
+
+        if usage is not None:
+            self._record_usage(usage.prompt_tokens, usage.completion_tokens)
+        else:
+            # 중간에 끊으면 usage 청크를 받지 못하므로 받은 만큼으로 추정
+            self._record_usage(approx_tokens(prompt), approx_tokens(cutter.text), estimated=True)
+        if self.step_metrics is not None:
+            self.step_metrics.set_stream(cut < received, first_ms, received - cut)
+        return text
+
+    def _api_stream(self, prompt):
+        from openai import BadRequestError
+
+        kwargs = self._sampling_kwargs()
+        if self._send_stop:
+            kwargs["stop"] = STREAM_STOP_SEQUENCES
+        try:
+            stream = self._create_stream(prompt, kwargs)
+        except BadRequestError as e:
+            if "stop" not in kwargs or "stop" not in str(e):
+                raise
+            # 이 모델은 stop을 받지 않는다: 이후 호출도 stop 없이 보낸다
+            self._send_stop = False
+            del kwargs["stop"]
+            stream = self._create_stream(prompt, kwargs)
+        try:
+            for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                yield delta, getattr(chunk, "usage", None)
+        finally:
+            # 끝까지 읽지 않고 닫으면 HTTP 응답이 끊겨 서버 쪽 생성도 멈춘다
+            stream.close()
+
+    def _create_stream(self, prompt, kwargs):
+        return self.client.chat.completions.create(
+            model=self.model_name,
+            messages=self._messages(prompt),
+            stream=True,
+            stream_options={"include_usage": True},
+            **kwargs
+        )
+
+    def _mock_stream(self, prompt):
+        # 실제 모델처럼 Action 뒤에 지어낸 Observation과 다음 step을 이어서 생성하는 흉내 (chunk마다 지연)
+        text = self._mock_completion(prompt) + MOCK_STREAM_TAIL
+        for i in range(0, len(text), MOCK_STREAM_CHUNK_CHARS):
+            time.sleep(MOCK_STREAM_CHUNK_DELAY)
+            yield text[i:i + MOCK_STREAM_CHUNK_CHARS], None
+
+    def _record_usage(self, prompt_tokens, completion_tokens, estimated=False):
+        if self.step_metrics is not None:
+            self.step_metrics.add_usage(prompt_tokens, completion_tokens, estimated=estimated)
+
+    def phase(self, name):
+        if self.step_metrics is None:
+            self.step_metrics = StepMetrics()
+        return self.step_metrics.phase(name)
+
+    def _mock_completion(self, prompt):
+        question = None
+        file_path = None
+        has_observation = False
+
+        for line in prompt.splitlines():
+            if line.startswith("Question: "):
+                question = line[len("Question: "):].strip()
+            elif line.startswith("Associated file path: "):
+                file_path = line[len("Associated file path: "):].strip()
+            elif line.strip().startswith("Observation:"):
+                has_observation = True
+
+        if has_observation:
+            if question is None:
+                question = "the question"
+            return "Thought: I have seen the tool result.\nAnswer: %s for %s." % (self.mock_answer, question)
+
+        if file_path is None:
+            return "Thought: mock mode but no file path found.\nAnswer: %s." % self.mock_answer
+
+        if file_path.endswith(".py"):
+            return (
+                "Thought: I should run the python script to get the numeric result.\n"
+                f"Action: python_exec(\"{file_path}\")"
+            )
+        elif file_path.endswith(".xlsx"):
+            q = question if question is not None else "Query over the spreadsheet."
+            return (
+                "Thought: I should query the spreadsheet using the question.\n"
+                f"Action: xlsx_query(\"{file_path}\", \"{q}\")"
+            )
+        else:
+            return "Thought: unsupported file type in mock mode.\nAnswer: %s." % self.mock_answer
+
+    def parse_turn(self, model_output):
+        return parse_turn(model_output, self.tools)
+
+    # ---- hooks ----
+
+    def retrieve_rules(self, question, file_path):
+        return []
+
+    def build_prompt(self, question, file_path, traj, reflections_used, rules):
+        return build_react_prompt(question, file_path, traj, reflections_used)
+
+    def _should_reflect(self, observation, model_output, traj):
+        return False
+
+    def _reflect(self, traj):
+        return "I should reconsider my previous tool choices and double-check the results."
+
+    def on_reflection(self, question, file_path, traj, reflection_note):
+        pass
+
+    def on_finish(self, log_obj):
+        pass
+
+    def close(self):
+        pass
+
+    # ---- main loop ----
+
+    def _resume_state(self, traj):
+        # 이전 실행에서 완료된 trajectory entry들로부터 (다음 step, reflection 횟수, 최종 답, 종료 여부) 복원
+        reflections_used = 0
+        for entry in traj:
+            if entry.get("thought", "").startswith("Reflection: ") and entry.get("action") is None:
+                reflections_used += 1
+        if not traj:
+            return 1, 0, None, False
+        last = traj[-1]
+        next_step = last["step"] + 1
+        if last.get("action") is None and not last.get("thought", "").startswith("Reflection: "):
+            if last.get("observation") is None and "Answer:" in last.get("thought", ""):
+                return next_step, reflections_used, last["thought"].split("Answer:", 1)[1].strip(), True
+            return next_step, reflections_used, None, True
+        return next_step, reflections_used, None, False
+
+    def _maybe_reflect(self, question, file_path, traj, reflections_used, record):
+        # traj[-1]은 방금 기록된 도구 step. reflection을 했으면 늘어난 reflection 횟수를 반환
+        last = traj[-1]
+        if not self._should_reflect(last["observation"], last["thought"], traj):
+            return reflections_used
+        if reflections_used >= self.max_reflections:
+            return reflections_used
+        self.step_metrics = m = StepMetrics()
+        with m.phase("reflection"):
+            reflection_note = self._reflect(traj)
+            self.on_reflection(question, file_path, traj, reflection_note)
+        # on_reflection 안에서 기록된 bank 시간은 reflection 시간에서 분리
+        if "bank" in m.timings:
+            m.timings["reflection"] = round(m.timings["reflection"] - m.timings["bank"], 3)
+        record(
+            {
+                "step": last["step"],
+                "thought": "Reflection: " + reflection_note,
+                "action": None,
+                "observation": None,
+                "retrieved_rules": last.get("retrieved_rules", []),
+                "metrics": m.to_dict(),
+            }
+        )
+        return reflections_used + 1
+
+    def run_single(
+        self,
+        task_id,
+        question,
+        file_name,
+        base_dir=".",
+        run_id=0,
+        resume_traj=None,
+        on_step=None,
+        cancel=None,
+        speculate=None,
+    ):
+        # cancel: threading.Event. set 되면 다음 step 경계(모델 호출 / 도구 실행 전)에서 멈춘다.
+        # speculate: None이면 agent 설정(self.speculate)을 따른다.
+        traj = list(resume_traj or [])
+        start_step, reflections_used, final_answer, finished = self._resume_state(traj)
+        if finished:
+            # 이미 Answer(또는 파싱 실패)로 끝난 trajectory는 루프를 다시 돌지 않는다
+            start_step = self.max_steps + 1
+        t_start = time.perf_counter()
+
+        file_path = str(Path(base_dir) / file_name)
+        cancelled = False
+
+        speculation = None
+        if speculate is None:
+            speculate = self.speculate
+        if speculate and start_step == 1:
+            # 첫 모델 응답을 기다리는 동안 파일에 대한 첫 도구 작업을 미리 시작
+            speculation = Speculation(file_path)
+
+        def record(entry):
+            traj.append(entry)
+            if on_step is not None:
+                on_step(entry)
+
+        if traj and not finished and traj[-1].get("action") is not None:
+            # 도구 step까지만 journal에 남고 그 뒤 reflection 전에 중단된 경우: reflection 판단부터 다시
+            reflections_used = self._maybe_reflect(question, file_path, traj, reflections_used, record)
+
+        for step in range(start_step, self.max_steps + 1):
+            if cancel is not None and cancel.is_set():
+                cancelled = True
+                break
+            self.step_metrics = m = StepMetrics()
+
+            with m.phase("bank"):
+                rules = self.retrieve_rules(question, file_path)
+            rule_ids = [r.get("id") for r in rules]
+            with m.phase("prompt_build"):
+                prompt = self.build_prompt(question, file_path, traj, reflections_used, rules)
+
+            with m.phase("model_call"):
+                model_output = self.call_model(prompt)
+
+            with m.phase("parse"):
+                turn = self.parse_turn(model_output)
+
+            if turn["answer"] is not None:
+                final_answer = turn["answer"]
+                record(
+                    {
+                        "step": step,
+                        "thought": model_output,
+                        "action": None,
+                        "observation": None,
+                        "retrieved_rules": rule_ids,
+                        "metrics": m.to_dict(),
+                    }
+                )
+                break
+
+            actions = turn["actions"]
+            if not actions:
+                record(
+                    {
+                        "step": step,
+                        "thought": model_output,
+                        "action": None,
+                        "observation": {"error": "no_action_parsed"},
+                        "retrieved_rules": rule_ids,
+                        "metrics": m.to_dict(),
+                    }
+                )
+                break
+
+            # Action이 하나면 기존 형식 그대로, 여러 개면 action / observation을 같은 순서의 리스트로 기록
+            action = actions[0] if len(actions) == 1 else actions
+
+            if cancel is not None and cancel.is_set():
+                # 모델 호출 비용은 남기고 도구는 실행하지 않는다
+                cancelled = True
+                record(
+                    {
+                        "step": step,
+                        "thought": model_output,
+                        "action": action,
+                        "observation": {"error": "cancelled"},
+                        "retrieved_rules": rule_ids,
+                        "metrics": m.to_dict(),
+                    }
+                )
+                break
+
+            info = {}
+            with m.phase("tool"):
+                if len(actions) == 1:
+                    observation = self.tools.execute(action["tool"], action["input"], info=info)
+                    hits = [info.get("cache_hit", False)]
+                else:
+                    observation = self.tools.execute_many([(a["tool"], a["input"]) for a in actions], info=info)
+                    hits = info["cache_hits"]
+            for hit in hits:
+                m.add_tool_call(hit)
+
+            record(
+                {
+                    "step": step,
+                    "thought": model_output,
+                    "action": action,
+                    "observation": observation,
+                    "retrieved_rules": rule_ids,
+                    "metrics": m.to_dict(),
+                }
+            )
+
+            reflections_used = self._maybe_reflect(question, file_path, traj, reflections_used, record)
+
+        self.step_metrics = None
+        judgment = "answered" if final_answer else "failed"
+        if cancelled and not final_answer:
+            judgment = "cancelled"
+
+        log_obj = {
+            "task_id": task_id,
+            "mode": self.mode,
+            "run_id": run_id,
+            "question": question,
+            "file_name": file_name,
+            "final_answer": final_answer,
+            "judgment": judgment,
+            "wall_ms": round((time.perf_counter() - t_start) * 1000.0, 3),
+            "trajectory": traj,
+        }
+        if cancelled:
+            log_obj["cancelled"] = True
+        if speculation is not None:
+            log_obj["speculation"] = speculation.finish()
+
+        self.on_finish(log_obj)
+        self._save_traj(task_id, run_id, log_obj)
+        return log_obj
+
+    def _save_traj(self, task_id, run_id, log_obj):
+        self.sink.write(log_obj)
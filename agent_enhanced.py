@@ -1,18 +1,14 @@
-
 import json
-import os
-import re
 import argparse
-from pathlib import Path
-
-from openai import OpenAI
 
-from tools import python_exec, xlsx_query
+from agent_core import AgentCore, observation_has_error
 from prompt_templates import build_react_prompt_enhanced
-from reasoning_bank import ReasoningBank
+from reasoning_bank import open_bank
+
 
+class EnhancedAgent(AgentCore):
+    mock_answer = "mock enhanced answer"
 
-class EnhancedAgent:
     def __init__(
         self,
         mode="enhanced",
@@ -22,94 +18,27 @@ class EnhancedAgent:
         api_key=None,
         mock=False,
         bank_path="memory/bank.json",
+        bank_capacity=None,
+        runs_dir="runs",
+        sink=None,
+        temperature=None,
+        stream=False,
+        speculate=False,
     ):
-        self.mode = mode
-        self.max_steps = max_steps
-        self.max_reflections = max_reflections
-        self.model_name = model_name
-        self.mock = mock
-
-        self.bank = ReasoningBank(bank_path)
-
-        if not self.mock:
-            if api_key is None:
-                api_key = os.getenv("OPENAI_API_KEY")
-            if not api_key:
-                raise RuntimeError("OpenAI API key is required unless mock mode is enabled.")
-            self.client = OpenAI(api_key=api_key)
-        else:
-            self.client = None
-
-    def call_model(self, prompt):
-        if self.mock:
-            question = None
-            file_path = None
-            has_observation = False
-
-            for line in prompt.splitlines():
-                if line.startswith("Question: "):
-                    question = line[len("Question: "):].strip()
-                elif line.startswith("Associated file path: "):
-                    file_path = line[len("Associated file path: "):].strip()
-                elif line.strip().startswith("Observation:"):
-                    has_observation = True
-
-            if has_observation:
-                if question is None:
-                    question = "the question"
-                return "Thought: I have seen the tool result.\nAnswer: mock enhanced answer for %s." % question
-
-            if file_path is None:
-                return "Thought: mock mode but no file path found.\nAnswer: mock enhanced answer."
-
-            if file_path.endswith(".py"):
-                return (
-                    "Thought: I should run the python script to get the numeric result.\n"
-                    f"Action: python_exec(\"{file_path}\")"
-                )
-            elif file_path.endswith(".xlsx"):
-                q = question if question is not None else "Query over the spreadsheet."
-                return (
-                    "Thought: I should query the spreadsheet using the question.\n"
-                    f"Action: xlsx_query(\"{file_path}\", \"{q}\")"
-                )
-            else:
-                return "Thought: unsupported file type in mock mode.\nAnswer: mock enhanced answer."
-
-        resp = self.client.chat.completions.create(
-            model=self.model_name,
-            messages=[
-                {"role": "system", "content": "You are a helpful reasoning agent that uses tools via ReAct."},
-                {"role": "user", "content": prompt},
-            ],
+        self.bank = open_bank(bank_path, capacity=bank_capacity)
+        super().__init__(
+            mode=mode,
+            max_steps=max_steps,
+            max_reflections=max_reflections,
+            model_name=model_name,
+            api_key=api_key,
+            mock=mock,
+            runs_dir=runs_dir,
+            sink=sink,
+            temperature=temperature,
+            stream=stream,
+            speculate=speculate,
         )
-        return resp.choices[0].message.content
-
-    def parse_action(self, model_output):
-        lines = model_output.splitlines()
-        action_line = None
-        for line in lines:
-            if line.strip().lower().startswith("action:"):
-                action_line = line.strip()
-                break
-
-        if action_line is None:
-            return None
-
-        action_part = action_line.split(":", 1)[1].strip()
-
-        m_py = re.match(r'python_exec\(["\'](.+?)["\']\)', action_part)
-        if m_py:
-            return {"tool": "python_exec", "input": m_py.group(1)}
-
-        m_xlsx = re.match(r'xlsx_query\(["\'](.+?)["\']\s*,\s*["\'](.+?)["\']\)', action_part)
-        if m_xlsx:
-            return {
-                "tool": "xlsx_query",
-                "input": {"path": m_xlsx.group(1), "query": m_xlsx.group(2)},
-            }
-
-        return None
 
     def _infer_tags(self, question, file_path):
         tags = []
@@ -127,100 +56,37 @@ class EnhancedAgent:
             tags.append("operating_status")
         return tags
 
-    def run_single(self, task_id, question, file_name, base_dir=".", run_id=0):
-        traj = []
-        reflections_used = 0
-        final_answer = None
-
-        file_path = str(Path(base_dir) / file_name)
-
-        for step in range(1, self.max_steps + 1):
-            tags = self._infer_tags(question, file_path)
-            rules = self.bank.retrieve_rules(tags=tags, max_rules=2)
-            prompt = build_react_prompt_enhanced(question, file_path, traj, reflections_used, rules)
-
-            model_output = self.call_model(prompt)
-
-            if "Answer:" in model_output:
-                answer_part = model_output.split("Answer:", 1)[1].strip()
-                final_answer = answer_part
-                traj.append(
-                    {
-                        "step": step,
-                        "thought": model_output,
-                        "action": None,
-                        "observation": None,
-                        "retrieved_rules": [r.get("id") for r in rules],
-                    }
-                )
-                break
-
-            action_spec = self.parse_action(model_output)
-
-            if action_spec is None:
-                traj.append(
-                    {
-                        "step": step,
-                        "thought": model_output,
-                        "action": None,
-                        "observation": {"error": "no_action_parsed"},
-                        "retrieved_rules": [r.get("id") for r in rules],
-                    }
-                )
-                break
-
-            tool_name = action_spec["tool"]
-            tool_input = action_spec["input"]
-
-            if tool_name == "python_exec":
-                observation = python_exec(tool_input)
-            elif tool_name == "xlsx_query":
-                observation = xlsx_query(tool_input["path"], tool_input["query"])
-            else:
-                observation = {"error": "unknown_tool"}
-
-            traj.append(
-                {
-                    "step": step,
-                    "thought": model_output,
-                    "action": {"tool": tool_name, "input": tool_input},
-                    "observation": observation,
-                    "retrieved_rules": [r.get("id") for r in rules],
-                }
-            )
-
-            if self._should_reflect(observation, model_output, traj) and reflections_used < self.max_reflections:
-                reflections_used += 1
-                reflection_note = self._reflect(traj)
-                new_rules = self._generate_rules(question, file_path, traj, reflection_note)
-                for r in new_rules:
-                    self.bank.add_rule(r)
-                traj.append(
-                    {
-                        "step": step,
-                        "thought": "Reflection: " + reflection_note,
-                        "action": None,
-                        "observation": None,
-                        "retrieved_rules": [r.get("id") for r in rules],
-                    }
-                )
-
-
-        judgment = "answered" if final_answer else "failed"
-
-        log_obj = {
-            "task_id": task_id,
-            "mode": self.mode,
-            "run_id": run_id,
-            "question": question,
-            "file_name": file_name,
-            "final_answer": final_answer,
-            "judgment": judgment,
-            "trajectory": traj,
-        }
-
-        self._save_traj(task_id, run_id, log_obj)
-        return log_obj
+    def retrieve_rules(self, question, file_path):
+        tags = self._infer_tags(question, file_path)
+        return self.bank.retrieve_rules(tags=tags, max_rules=2)
+
+    def build_prompt(self, question, file_path, traj, reflections_used, rules):
+        return build_react_prompt_enhanced(question, file_path, traj, reflections_used, rules)
+
+    def on_reflection(self, question, file_path, traj, reflection_note):
+        new_rules = self._generate_rules(question, file_path, traj, reflection_note)
+        with self.phase("bank"):
+            for r in new_rules:
+                self.bank.add_rule(r)
+
+    def on_finish(self, log_obj):
+        # 이 task에서 참고한 규칙들의 성공/step 통계를 갱신 (eviction 시 utility 계산에 사용)
+        if log_obj["judgment"] == "cancelled":
+            # self-consistency에서 다른 sample이 먼저 합의해 중단된 trajectory는 성공/실패로 세지 않는다
+            return
+        rule_ids = []
+        steps = set()
+        for step_log in log_obj["trajectory"]:
+            steps.add(step_log["step"])
+            for rid in step_log.get("retrieved_rules", []):
+                if rid not in rule_ids:
+                    rule_ids.append(rid)
+        if rule_ids:
+            self.bank.record_outcome(rule_ids, log_obj["judgment"], len(steps))
+
+    def close(self):
+        # 원격 bank 클라이언트는 모아 둔 사용 기록을 여기서 보낸다
+        self.bank.close()
 
     def _should_reflect(self, observation, model_output, traj):
         # 1) mock 모드에서는 항상 한 번은 Reflection 하도록 (테스트, bank.json 생성용)
@@ -228,7 +94,7 @@ class EnhancedAgent:
             return True
 
         # 2) 툴이 에러를 반환하면 Reflection
-        if isinstance(observation, dict) and "error" in observation:
+        if observation_has_error(observation):
             return True
 
         lower = model_output.lower()
@@ -251,10 +117,6 @@ class EnhancedAgent:
 
         return False
 
-
-    def _reflect(self, traj):
-        return "I should reconsider my previous tool choices and double-check the results."
-
     def _build_trajectory_text(self, traj):
         lines = []
         for step_log in traj:
@@ -286,7 +148,7 @@ class EnhancedAgent:
                 break
 
         polarity = "success"
-        if isinstance(last_obs, dict) and "error" in last_obs:
+        if observation_has_error(last_obs):
             polarity = "failure"
 
         # content는 체크리스트 형태로 1~3줄 정도로 단순히 고정
@@ -307,13 +169,6 @@ class EnhancedAgent:
 
         return [rule]
 
-    def _save_traj(self, task_id, run_id, log_obj):
-        out_dir = Path("runs") / str(task_id)
-        out_dir.mkdir(parents=True, exist_ok=True)
-        path = out_dir / ("enhanced_%d.json" % run_id)
-        with path.open("w", encoding="utf-8") as f:
-            json.dump(log_obj, f, ensure_ascii=False, indent=2)
-
 
 def parse_args():
     parser = argparse.ArgumentParser()
@@ -342,12 +197,16 @@ if __name__ == "__main__":
         bank_path=args.bank_path,
     )
 
-    log = agent.run_single(
-        task_id=args.task_id,
-        question=args.question,
-        file_name=args.file_name,
-        base_dir=args.base_dir,
-        run_id=args.run_id,
-    )
+    try:
+        log = agent.run_single(
+            task_id=args.task_id,
+            question=args.question,
+            file_name=args.file_name,
+            base_dir=args.base_dir,
+            run_id=args.run_id,
+        )
+    finally:
+        # 원격 bank면 모아 둔 사용 기록을 보낸다
+        agent.close()
     print("final_answer:", log["final_answer"])
     print("judgment:", log["judgment"])
@@ -0,0 +1,289 @@
+# bank_server.py
+# 여러 agent 프로세스(머신)가 하나의 ReasoningBank를 같이 쓰도록 HTTP로 여는 가벼운 서버와 클라이언트.
+#
+#   python bank_server.py --bank_path memory/bank.json --port 8765
+#   python run_enhanced.py --bank_path http://127.0.0.1:8765
+#
+# 엔드포인트 (모두 JSON, POST는 여러 건을 한 번에 받는다)
+#   GET  /version                                   -> {"version"}
+#   POST /retrieve {"queries": [{"tags", "polarity", "max_rules"}, ...]} -> {"version", "results": [[rule, ...], ...]}
+#   POST /add      {"rules": [rule, ...]}           -> {"version", "rules": [저장된(또는 병합된) rule, ...]}
+#   POST /usage    {"used": [rule_id, ...], "outcomes": [{"rule_ids", "judgment", "steps"}, ...]} -> {"version"}
+#
+# version은 retrieve 결과가 달라질 수 있는 변경(추가 / 병합 / eviction)에서만 올라간다.
+# 검색 순위는 use_count / 통계와 무관하므로 사용 횟수 반영으로는 클라이언트 캐시를 무효화하지 않는다.
+
+import json
+import time
+import uuid
+import argparse
+import threading
+import http.client
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+from reasoning_bank import open_bank
+
+
+def _copy_rule(rule):
+    # stats / merged_ids 같은 안쪽 dict·list도 제자리에서 바뀌므로 한 단계 더 복사
+    return {k: dict(v) if isinstance(v, dict) else list(v) if isinstance(v, list) else v for k, v in rule.items()}
+
+
+class BankService:
+    def __init__(self, bank):
+        self.bank = bank
+        # 서버가 다시 뜨면 epoch가 바뀌어 이전 version으로 캐시된 결과가 재사용되지 않는다
+        self._epoch = uuid.uuid4().hex[:8]
+        self._n = 0
+        self._lock = threading.Lock()
+
+    @property
+    def version(self):
+        return "%s.%d" % (self._epoch, self._n)
+
+    def retrieve(self, queries):
+        # version 읽기, 조회, 규칙 복사를 한 lock 안에서 한다. bank가 돌려주는 규칙은 bank 안의 dict 그대로라
+        # 응답을 직렬화하는 동안 다른 요청의 add / usage가 같은 dict를 고치지 못하게 lock 안에서 복사해 둔다.
+        with self._lock:
+            results = []
+            for q in queries:
+                rules = self.bank.retrieve_rules(
+                    tags=q.get("tags"),
+                    polarity=q.get("polarity"),
+                    max_rules=int(q.get("max_rules", 2)),
+                )
+                results.append([_copy_rule(r) for r in rules])
+            return {"version": self.version, "results": results}
+
+    def add(self, rules):
+        # 추가와 version 증가를 한 번에 (그 사이에 retrieve가 version을 읽지 못하게)
+        with self._lock:
+            saved = [self.bank.add_rule(r) for r in rules]
+            if saved:
+                self._n += 1
+            return {"version": self.version, "rules": saved}
+
+    def usage(self, used, outcomes):
+        # use_count / stats를 제자리에서 고치므로 retrieve의 복사와 겹치지 않게 같은 lock 안에서
+        with self._lock:
+            if used:
+                self.bank.mark_used(used)
+            for o in outcomes:
+                self.bank.record_outcome(o["rule_ids"], o["judgment"], o["steps"])
+            return {"version": self.version}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    service = None
+
+    def _send(self, status, obj):
+        body = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/version":
+            self._send(200, {"version": self.service.version})
+        else:
+            self._send(404, {"error": "not_found"})
+
+    def do_POST(self):
+        try:
+            n = int(self.headers.get("Content-Length", 0))
+            req = json.loads(self.rfile.read(n) or b"{}")
+            if self.path == "/retrieve":
+                resp = self.service.retrieve(req.get("queries", []))
+            elif self.path == "/add":
+                resp = self.service.add(req.get("rules", []))
+            elif self.path == "/usage":
+                resp = self.service.usage(req.get("used", []), req.get("outcomes", []))
+            else:
+                self._send(404, {"error": "not_found"})
+                return
+        except (ValueError, KeyError, TypeError) as e:
+            self._send(400, {"error": type(e).__name__, "message": str(e)})
+            return
+        self._send(200, resp)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(bank, host="127.0.0.1", port=8765):
+    handler = type("BankHandler", (_Handler,), {"service": BankService(bank)})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+class BankClient:
+    # ReasoningBank와 같은 메서드(retrieve_rules / add_rule / record_outcome)를 제공하는 원격 bank.
+    # - 조회 결과는 (tags, polarity, max_rules) 별로 캐시하고, 서버 version이 바뀌면 비운다.
+    #   version은 version_ttl 초마다 한 번 확인하며 다른 요청의 응답에서도 갱신된다.
+    # - 캐시로 응답한 조회의 사용 횟수와 record_outcome은 모아 두었다가 batch_size개마다 /usage로 보낸다.
+    def __init__(self, url, capacity=None, cache_size=1024, version_ttl=1.0, batch_size=32, timeout=30):
+        if capacity is not None:
+            raise ValueError("bank capacity is configured on the bank server (bank_server.py --capacity)")
+        u = urlparse(url)
+        self.url = url
+        self.host = u.hostname
+        self.port = u.port or 80
+        self.timeout = timeout
+        self.cache_size = cache_size
+        self.version_ttl = version_ttl
+        self.batch_size = batch_size
+
+        self._cache = OrderedDict()
+        self._version = None
+        self._checked_at = 0.0
+        self._used = []
+        self._outcomes = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.stats = {"requests": 0, "cache_hits": 0, "cache_misses": 0}
+
+    # ---- HTTP ----
+
+    def _conn(self):
+        # 스레드마다 keep-alive 연결 하나
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self._local.conn = conn
+        return conn
+
+    def _request(self, method, path, payload=None):
+        body = None if payload is None else json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        # /add, /usage는 서버가 이미 처리한 뒤 연결이 끊겼을 수도 있어 다시 보내면 두 번 반영된다
+        retry = method == "GET" or path == "/retrieve"
+        for attempt in (0, 1):
+            conn = self._conn()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                resp = conn.getresponse()
+                data = resp.read()
+                break
+            except (http.client.HTTPException, ConnectionError):
+                # 서버가 idle 연결을 닫은 경우 조회 요청만 한 번 새 연결로 재시도
+                conn.close()
+                self._local.conn = None
+                if attempt or not retry:
+                    raise
+        with self._lock:
+            self.stats["requests"] += 1
+        obj = json.loads(data)
+        if resp.status != 200:
+            raise RuntimeError("bank server error %d: %s" % (resp.status, obj))
+        if "version" in obj:
+            self._observe_version(obj["version"])
+        return obj
+
+    def _observe_version(self, version):
+        with self._lock:
+            if version != self._version:
+                self._cache.clear()
+                self._version = version
+            self._checked_at = time.monotonic()
+
+    def _fresh_version(self):
+        if time.monotonic() - self._checked_at > self.version_ttl:
+            self._request("GET", "/version")
+        return self._version
+
+    # ---- 조회 ----
+
+    @staticmethod
+    def _key(tags, polarity, max_rules):
+        return (tuple(sorted(str(t).lower() for t in (tags or []))), polarity, max_rules)
+
+    def retrieve_many(self, queries):
+        # queries: [{"tags", "polarity", "max_rules"}, ...]. 캐시에 없는 것만 한 번의 요청으로 묻는다
+        version = self._fresh_version()
+        results = [None] * len(queries)
+        missing = []
+        with self._lock:
+            for i, q in enumerate(queries):
+                key = self._key(q.get("tags"), q.get("polarity"), q.get("max_rules", 2))
+                hit = self._cache.get(key)
+                if hit is not None and hit[0] == version:
+                    self._cache.move_to_end(key)
+                    results[i] = hit[1]
+                    self._used.extend(r["id"] for r in hit[1] if "id" in r)
+                    self.stats["cache_hits"] += 1
+                else:
+                    missing.append(i)
+                    self.stats["cache_misses"] += 1
+
+        if missing:
+            resp = self._request("POST", "/retrieve", {"queries": [queries[i] for i in missing]})
+            with self._lock:
+                for i, rules in zip(missing, resp["results"]):
+                    results[i] = rules
+                    q = queries[i]
+                    key = self._key(q.get("tags"), q.get("polarity"), q.get("max_rules", 2))
+                    self._cache[key] = (resp["version"], rules)
+                    self._cache.move_to_end(key)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        self._maybe_flush()
+        return results
+
+    def retrieve_rules(self, tags=None, polarity=None, max_rules=2):
+        return self.retrieve_many([{"tags": tags or [], "polarity": polarity, "max_rules": max_rules}])[0]
+
+    # ---- 쓰기 ----
+
+    def add_rules(self, rules):
+        return self._request("POST", "/add", {"rules": list(rules)})["rules"]
+
+    def add_rule(self, rule):
+        return self.add_rules([rule])[0]
+
+    def record_outcome(self, rule_ids, judgment, steps):
+        with self._lock:
+            self._outcomes.append({"rule_ids": list(rule_ids), "judgment": judgment, "steps": int(steps)})
+        self._maybe_flush()
+
+    def _maybe_flush(self):
+        if len(self._used) + len(self._outcomes) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            used, self._used = self._used, []
+            outcomes, self._outcomes = self._outcomes, []
+        if used or outcomes:
+            self._request("POST", "/usage", {"used": used, "outcomes": outcomes})
+
+    def close(self):
+        self.flush()
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bank_path", type=str, default="memory/bank.json")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--capacity", type=int, default=None, help="max rules kept in the bank (others are archived)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    server = make_server(open_bank(args.bank_path, capacity=args.capacity), args.host, args.port)
+    print("serving %s on http://%s:%d" % (args.bank_path, args.host, args.port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
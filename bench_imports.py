@@ -0,0 +1,121 @@
+# bench_imports.py
+# runner / worker 모듈의 cold import 시간을 측정한다.
+# 매 측정마다 새 python 프로세스에서 import 하므로 모듈 캐시 영향 없이 CLI 시작 비용을 본다.
+#
+#   python bench_imports.py --repeats 10
+#   python bench_imports.py --against HEAD~1     # 이전 revision 과 비교
+
+import json
+import argparse
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+from pathlib import Path
+
+from benchmark import mean_ci
+
+
+# run_*.py: CLI 시작, scheduler/tool_registry: prefetch·도구 worker 가 import 하는 모듈
+TARGETS = ["tools", "tool_registry", "scheduler", "agent_core", "run_baseline", "run_enhanced"]
+
+
+def time_import(module, cwd):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "import %s" % module], cwd=str(cwd), check=True)
+    return (time.perf_counter() - start) * 1000.0
+
+
+def heavy_imports(module, cwd, min_ms=20.0):
+    # -X importtime 출력에서 최상위(들여쓰기 1단계) 의존 패키지 중 오래 걸린 것만 고른다
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import %s" % module],
+        cwd=str(cwd), capture_output=True, text=True, check=True,
+    )
+    heavy = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip() == "cumulative":
+            continue
+        depth = (len(name) - len(name.lstrip())) // 2
+        ms = int(cumulative) / 1000.0
+        if depth == 1 and ms >= min_ms:
+            heavy[name.strip()] = round(ms, 1)
+    return heavy
+
+
+def measure(cwd, targets, repeats):
+    base = [time_import("sys", cwd) for _ in range(repeats)]
+    interp = sum(base) / len(base)
+    result = {"interpreter_ms": round(interp, 1), "modules": {}}
+    for module in targets:
+        # 인터프리터 기동 시간을 빼서 import 자체 비용만 남긴다
+        samples = [max(0.0, time_import(module, cwd) - interp) for _ in range(repeats)]
+        result["modules"][module] = {
+            "import_ms": mean_ci([round(v, 1) for v in samples]),
+            "heavy": heavy_imports(module, cwd),
+        }
+    return result
+
+
+def checkout(rev, dest):
+    # 작업 트리를 건드리지 않도록 git archive 로 임시 디렉터리에 풀어 둔다
+    proc = subprocess.run(["git", "archive", rev], capture_output=True, check=True)
+    tar_path = Path(dest) / "src.tar"
+    tar_path.write_bytes(proc.stdout)
+    with tarfile.open(tar_path) as tar:
+        tar.extractall(dest)
+    return Path(dest)
+
+
+def print_table(report):
+    cols = [k for k in ("against", "current") if k in report]
+    print("%-16s" % "module" + "".join("%16s" % c for c in cols))
+    for module in report["current"]["modules"]:
+        row = "%-16s" % module
+        for c in cols:
+            st = report[c]["modules"].get(module)
+            if st is None:
+                row += "%16s" % "-"
+                continue
+            ci = st["import_ms"]["ci95"]
+            row += "%16s" % ("%.1f±%.1f" % (st["import_ms"]["mean"], ci or 0.0))
+        print(row)
+    for module, st in report["current"]["modules"].items():
+        if st["heavy"]:
+            print("  %s heavy deps: %s" % (module, ", ".join("%s=%.1fms" % kv for kv in st["heavy"].items())))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modules", type=str, default=",".join(TARGETS))
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--against", type=str, default=None, help="git revision to compare with")
+    parser.add_argument("--out", type=str, default=None)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    targets = [m.strip() for m in args.modules.split(",") if m.strip()]
+    report = {"repeats": args.repeats, "current": measure(Path("."), targets, args.repeats)}
+
+    if args.against:
+        with tempfile.TemporaryDirectory(prefix="bench_imports_") as tmp:
+            src = checkout(args.against, tmp)
+            report["against_rev"] = args.against
+            report["against"] = measure(src, targets, args.repeats)
+
+    print_table(report)
+    if args.out:
+        out = Path(args.out)
+        out.parent.mkdir(parents=True, exist_ok=True)
+        with out.open("w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
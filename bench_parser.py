@@ -0,0 +1,93 @@
+# bench_parser.py
+# action_parser.parse_turn 마이크로벤치마크.
+# 이전 방식(splitlines + 줄마다 strip/lower + 매 호출 regex 조회)과 같은 입력에서 호출당 시간을 비교한다.
+#
+#   python bench_parser.py --number 20000
+
+import re
+import json
+import argparse
+import timeit
+
+from action_parser import parse_turn
+from tool_registry import REGISTRY
+
+
+def legacy_parse(model_output, registry):
+    # 변경 전 AgentCore 의 Answer 판정 + parse_action + ToolRegistry.parse_call
+    if "Answer:" in model_output:
+        return {"answer": model_output.split("Answer:", 1)[1].strip(), "actions": []}
+    action_line = None
+    for line in model_output.splitlines():
+        if line.strip().lower().startswith("action:"):
+            action_line = line.strip()
+            break
+    if action_line is None:
+        return {"answer": None, "actions": []}
+    action_part = action_line.split(":", 1)[1].strip()
+    m = re.match(r"^\s*([A-Za-z_]\w*)\s*\((.*)\)\s*$", action_part, re.S)
+    if m is None:
+        return {"answer": None, "actions": []}
+    args = []
+    pos = 0
+    arg_text = m.group(2).strip()
+    while pos < len(arg_text):
+        a = re.compile(r"""(["'])(.*?)\1\s*(?:,|$)""", re.S).match(arg_text, pos)
+        if a is None:
+            return {"answer": None, "actions": []}
+        args.append(a.group(2))
+        pos = a.end()
+        while pos < len(arg_text) and arg_text[pos].isspace():
+            pos += 1
+    spec = registry.bind(m.group(1), args)
+    return {"answer": None, "actions": [spec] if spec else []}
+
+
+def _reasoning(n_lines):
+    return "\n".join(
+        "Thought: step %d, the spreadsheet has several sheets and I need to check column %d." % (i, i)
+        for i in range(n_lines)
+    )
+
+
+CASES = {
+    "short_action": 'Thought: run it.\nAction: python_exec("test/a.py")',
+    "short_answer": "Thought: I have seen the tool result.\nAnswer: 12055.",
+    "long_action": _reasoning(200) + '\nAction: xlsx_query("test/b.xlsx", "Which city had the greater total sales?")',
+    "long_answer": _reasoning(200) + "\nAnswer: Wharvton",
+    "long_no_action": _reasoning(200),
+    "escaped_args": 'Action: xlsx_query("test/b.xlsx", "Which is \\"Wharvton\\" or \'Algrimand\'?")',
+    "multi_action": 'Thought: both.\nAction: python_exec("test/a.py")\nAction: xlsx_query("test/b.xlsx", "total sales")',
+}
+
+
+def bench(fn, text, number):
+    t = timeit.timeit(lambda: fn(text, REGISTRY), number=number)
+    return t / number * 1e6
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", type=int, default=20000)
+    parser.add_argument("--out", type=str, default=None)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    report = {}
+    print("%-16s %12s %12s %8s  %s" % ("case", "legacy_us", "parser_us", "speedup", "actions(legacy/parser)"))
+    for name, text in CASES.items():
+        old = bench(legacy_parse, text, args.number)
+        new = bench(parse_turn, text, args.number)
+        n_old = len(legacy_parse(text, REGISTRY)["actions"])
+        n_new = len(parse_turn(text, REGISTRY)["actions"])
+        report[name] = {"bytes": len(text), "legacy_us": round(old, 3), "parser_us": round(new, 3)}
+        print("%-16s %12.3f %12.3f %7.1fx  %d/%d" % (name, old, new, old / new, n_old, n_new))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
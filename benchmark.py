@@ -0,0 +1,232 @@
+# benchmark.py
+# baseline vs enhanced 를 같은 task set 에서 N번 반복 실행해 step / 모델 호출 / 토큰 / 도구 시간 / wall time 을 비교한다.
+
+import json
+import math
+import shutil
+import argparse
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from agent_baseline import ReActAgent
+from agent_enhanced import EnhancedAgent
+from metrics import count_steps
+from tool_registry import REGISTRY
+
+
+METRICS = ["steps", "model_calls", "prompt_tokens", "completion_tokens", "tool_ms", "wall_ms"]
+
+# 95% 양측 t 분포 임계값 (자유도 -> t)
+_T95 = {1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365, 8: 2.306, 9: 2.262,
+        10: 2.228, 12: 2.179, 15: 2.131, 20: 2.086, 25: 2.060, 30: 2.042}
+
+
+def _t95(df):
+    if df <= 0:
+        return float("nan")
+    if df > 30:
+        return 1.96
+    keys = [k for k in sorted(_T95) if k <= df]
+    return _T95[keys[-1]]
+
+
+def mean_ci(values):
+    n = len(values)
+    mean = sum(values) / n
+    if n < 2:
+        return {"n": n, "mean": round(mean, 3), "ci95": None, "min": min(values), "max": max(values)}
+    var = sum((v - mean) ** 2 for v in values) / (n - 1)
+    half = _t95(n - 1) * math.sqrt(var / n)
+    return {"n": n, "mean": round(mean, 3), "ci95": round(half, 3), "min": min(values), "max": max(values)}
+
+
+def task_stats(log):
+    model_calls = 0
+    prompt_tokens = 0
+    completion_tokens = 0
+    tool_ms = 0.0
+    for step_log in log["trajectory"]:
+        m = step_log.get("metrics", {})
+        timings = m.get("timings_ms", {})
+        if "model_call" in timings:
+            model_calls += 1
+        tool_ms += timings.get("tool", 0.0)
+        prompt_tokens += m.get("tokens", {}).get("prompt", 0)
+        completion_tokens += m.get("tokens", {}).get("completion", 0)
+    return {
+        "steps": count_steps(log["trajectory"]),
+        "model_calls": model_calls,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "tool_ms": round(tool_ms, 3),
+        "wall_ms": log["wall_ms"],
+        "judgment": log["judgment"],
+    }
+
+
+def make_agent(mode, args, workdir):
+    common = dict(
+        max_steps=8,
+        max_reflections=2,
+        model_name=args.model,
+        api_key=args.api_key,
+        mock=args.mock,
+        runs_dir=str(workdir / "runs"),
+    )
+    if mode == "baseline":
+        return ReActAgent(mode="baseline", **common)
+
+    bank_path = workdir / "bank.json"
+    if args.bank_path and Path(args.bank_path).exists():
+        shutil.copy(args.bank_path, bank_path)
+    return EnhancedAgent(mode="enhanced", bank_path=str(bank_path), **common)
+
+
+def run_once(mode, tasks, args):
+    with tempfile.TemporaryDirectory(prefix="bench_") as tmp:
+        agent = make_agent(mode, args, Path(tmp))
+        if not args.warm_cache:
+            REGISTRY.clear_cache()
+        out = []
+        try:
+            for idx, task in enumerate(tasks, start=1):
+                log = agent.run_single(
+                    task_id=idx,
+                    question=task["question"],
+                    file_name=task["file_name"],
+                    base_dir=args.base_dir,
+                    run_id=0,
+                )
+                out.append(task_stats(log))
+        finally:
+            agent.close()
+        return out
+
+
+def aggregate(samples):
+    # samples: rep -> [task stats]
+    per_task = {}
+    for rep in samples:
+        for idx, st in enumerate(rep, start=1):
+            per_task.setdefault(idx, []).append(st)
+
+    result = {"tasks": {}, "total": {}}
+    for idx, sts in per_task.items():
+        entry = {k: mean_ci([s[k] for s in sts]) for k in METRICS}
+        entry["answered_rate"] = round(sum(1 for s in sts if s["judgment"] == "answered") / len(sts), 3)
+        result["tasks"][str(idx)] = entry
+
+    totals = [{k: sum(s[k] for s in rep) for k in METRICS} for rep in samples]
+    result["total"] = {k: mean_ci([t[k] for t in totals]) for k in METRICS}
+    return result
+
+
+def compare(current, previous, threshold):
+    regressions = []
+    for mode, res in current["modes"].items():
+        prev = previous.get("modes", {}).get(mode)
+        if prev is None:
+            continue
+        for k in METRICS:
+            cur_mean = res["total"][k]["mean"]
+            prev_mean = prev["total"][k]["mean"]
+            if prev_mean and (cur_mean - prev_mean) / prev_mean > threshold:
+                regressions.append(
+                    {"mode": mode, "metric": k, "previous": prev_mean, "current": cur_mean}
+                )
+    return regressions
+
+
+def _git_rev():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def print_table(report):
+    print("%-9s %-5s " % ("mode", "task") + " ".join("%18s" % k for k in METRICS))
+    for mode, res in report["modes"].items():
+        rows = list(res["tasks"].items()) + [("total", res["total"])]
+        for idx, entry in rows:
+            cells = []
+            for k in METRICS:
+                s = entry[k]
+                ci = "±%.1f" % s["ci95"] if s["ci95"] is not None else ""
+                cells.append("%18s" % ("%.1f%s" % (s["mean"], ci)))
+            print("%-9s %-5s " % (mode, idx) + " ".join(cells))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--api_key", type=str, required=False)
+    parser.add_argument("--model", type=str, default="gpt-4o-mini")
+    parser.add_argument("--tasks_path", type=str, default="test/사전과제.json")
+    parser.add_argument("--base_dir", type=str, default="test")
+    parser.add_argument("--bank_path", type=str, default="memory/bank.json")
+    parser.add_argument("--modes", type=str, default="baseline,enhanced")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--mock", action="store_true")
+    parser.add_argument("--warm_cache", action="store_true", help="keep tool results cached across repeats")
+    parser.add_argument("--out", type=str, default="bench/latest.json")
+    parser.add_argument("--history", type=str, default="bench/history.jsonl")
+    parser.add_argument("--compare", type=str, default=None, help="previous result file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.10)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    with open(args.tasks_path, "r", encoding="utf-8") as f:
+        tasks = json.load(f)
+
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    samples = {m: [] for m in modes}
+    t0 = time.perf_counter()
+    for rep in range(args.repeats):
+        for mode in modes:
+            samples[mode].append(run_once(mode, tasks, args))
+
+    report = {
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "git_rev": _git_rev(),
+        "config": {
+            "tasks_path": args.tasks_path,
+            "n_tasks": len(tasks),
+            "repeats": args.repeats,
+            "mock": args.mock,
+            "model": None if args.mock else args.model,
+            "warm_cache": args.warm_cache,
+        },
+        "elapsed_s": round(time.perf_counter() - t0, 3),
+        "modes": {m: aggregate(samples[m]) for m in modes},
+    }
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            previous = json.load(f)
+        report["regressions"] = compare(report, previous, args.threshold)
+
+    out_path = Path(args.out)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    with out_path.open("w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.history:
+        hist_path = Path(args.history)
+        hist_path.parent.mkdir(parents=True, exist_ok=True)
+        with hist_path.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(report, ensure_ascii=False) + "\n")
+
+    print_table(report)
+    for r in report.get("regressions", []):
+        print("REGRESSION %(mode)s %(metric)s: %(previous)s -> %(current)s" % r)
+
+
+if __name__ == "__main__":
+    main()
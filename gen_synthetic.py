@@ -0,0 +1,171 @@
+# gen_synthetic.py
+# 부하 테스트용 합성 task / workbook / script 생성기.
+# test/사전과제.json 과 같은 형식의 tasks.json 과 정답 파일(answers_key.json)을 만든다.
+
+import json
+import random
+import argparse
+from pathlib import Path
+
+
+CITIES = [
+    "Wharvton", "Algrimand", "Bellmoor", "Corvale", "Dunmere", "Eastholt", "Fenwick", "Glenbury",
+    "Harrowgate", "Ironvale", "Jasperton", "Kestrel", "Larkhaven", "Millbrook", "Northwold", "Oakridge",
+]
+MENU_ITEMS = ["Burgers", "Hot Dogs", "Salads", "Fries", "Ice Cream", "Soda"]
+LOCO_TYPES = ["Steam", "Diesel", "Electric"]
+STATUSES = ["Operational", "Under Restoration", "Static Display"]
+EXCURSIONS = ["Sunset Picnic Trip", "Murder Mystery Express", "Fall Foliage Tour", "Main Line Special"]
+
+# xlsx 한 시트의 최대 행 수 (헤더 제외)
+MAX_SHEET_ROWS = 1048575
+
+
+def _sheet_sizes(rows, sheets):
+    sheets = max(sheets, -(-rows // MAX_SHEET_ROWS))
+    base, extra = divmod(rows, sheets)
+    return [base + (1 if i < extra else 0) for i in range(sheets)]
+
+
+def write_sales_workbook(path, rows, sheets, rng):
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    totals = {}
+    left = rows
+    for i, n in enumerate(_sheet_sizes(rows, sheets), start=1):
+        ws = wb.create_sheet("Sheet%d" % i)
+        ws.append(["Location"] + MENU_ITEMS)
+        for _ in range(n):
+            left -= 1
+            if left == 0 and len(totals) == 1:
+                # sales_task는 서로 다른 도시 두 개를 비교하므로 마지막 행에서 두 번째 도시를 보장
+                city = rng.choice([c for c in CITIES if c not in totals])
+            else:
+                city = rng.choice(CITIES)
+            vals = [rng.randint(100, 5000) for _ in MENU_ITEMS]
+            totals[city] = totals.get(city, 0) + sum(vals)
+            ws.append([city] + vals)
+    wb.save(path)
+    return {"kind": "sales", "location_totals": totals}
+
+
+def write_status_workbook(path, rows, sheets, rng):
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    counts = {}
+    number = 1000
+    for i, n in enumerate(_sheet_sizes(rows, sheets), start=1):
+        ws = wb.create_sheet("Sheet%d" % i)
+        ws.append(["Number", "Type/Wheel Configuration", "Operating Status", "Excursion"])
+        for _ in range(n):
+            status = rng.choice(STATUSES)
+            excursion = rng.choice(EXCURSIONS) if status == "Operational" else None
+            counts[status] = counts.get(status, 0) + 1
+            ws.append([number, rng.choice(LOCO_TYPES), status, excursion])
+            number += 1
+    wb.save(path)
+    return {"kind": "status", "status_counts": counts}
+
+
+def write_script(path, rng):
+    a = rng.randint(2, 999)
+    b = rng.randint(2, 999)
+    n = rng.randint(10, 5000)
+    src = (
+        "total = 0\n"
+        "for i in range(%d):\n"
+        "    total += (i * %d) %% %d\n"
+        "print('Computing...')\n"
+        "print(total)\n" % (n, a, b)
+    )
+    path.write_text(src, encoding="utf-8")
+    return {"kind": "python", "answer": sum((i * a) % b for i in range(n))}
+
+
+def sales_task(meta, rng):
+    totals = meta["location_totals"]
+    a, b = rng.sample(sorted(totals), 2)
+    winner = a if totals[a] >= totals[b] else b
+    question = (
+        "The attached spreadsheet contains the sales of menu items for a regional fast-food chain. "
+        "Which city had the greater total sales: %s or %s?" % (a, b)
+    )
+    return question, winner
+
+
+def status_task(meta, rng):
+    counts = meta["status_counts"]
+    question = (
+        "The attached file lists the locomotives owned by a local railroad museum. "
+        "Based on the operating status column, how many locomotives are operational?"
+    )
+    return question, str(counts.get("Operational", 0))
+
+
+def generate(out_dir, n_tasks, n_workbooks, n_scripts, rows, sheets, seed):
+    if n_workbooks > 0 and rows < 2:
+        raise ValueError("--rows must be at least 2 (sales tasks compare two cities)")
+    rng = random.Random(seed)
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    files = []
+    for i in range(n_workbooks):
+        if i % 2 == 0:
+            name = "synthetic_sales_%04d.xlsx" % i
+            meta = write_sales_workbook(out_dir / name, rows, sheets, rng)
+        else:
+            name = "synthetic_status_%04d.xlsx" % i
+            meta = write_status_workbook(out_dir / name, rows, sheets, rng)
+        files.append((name, meta))
+    for i in range(n_scripts):
+        name = "synthetic_script_%04d.py" % i
+        files.append((name, write_script(out_dir / name, rng)))
+
+    if not files:
+        raise ValueError("at least one workbook or script is required")
+
+    tasks = []
+    key = []
+    for idx in range(1, n_tasks + 1):
+        name, meta = rng.choice(files)
+        if meta["kind"] == "sales":
+            question, answer = sales_task(meta, rng)
+        elif meta["kind"] == "status":
+            question, answer = status_task(meta, rng)
+        else:
+            question, answer = "What is the final numeric output from the attached Python code?", str(meta["answer"])
+        tasks.append({"question": question, "file_name": name})
+        key.append({"task_id": idx, "file_name": name, "answer": answer})
+
+    with (out_dir / "tasks.json").open("w", encoding="utf-8") as f:
+        json.dump(tasks, f, ensure_ascii=False, indent=2)
+    with (out_dir / "answers_key.json").open("w", encoding="utf-8") as f:
+        json.dump(key, f, ensure_ascii=False, indent=2)
+    return tasks, key
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--out_dir", type=str, default="synthetic")
+    parser.add_argument("--n_tasks", type=int, default=1000)
+    parser.add_argument("--n_workbooks", type=int, default=20)
+    parser.add_argument("--n_scripts", type=int, default=20)
+    parser.add_argument("--rows", type=int, default=10000, help="data rows per workbook (split across sheets)")
+    parser.add_argument("--sheets", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    tasks, _ = generate(
+        args.out_dir, args.n_tasks, args.n_workbooks, args.n_scripts, args.rows, args.sheets, args.seed
+    )
+    print("wrote %d tasks to %s" % (len(tasks), Path(args.out_dir) / "tasks.json"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# journal.py
+# run 진행 상황을 append-only JSONL로 남기는 journal.
+# step 하나, task 하나가 끝날 때마다 fsync 하므로 중간에 죽어도 --resume 으로 이어서 실행할 수 있다.
+#
+#   {"type": "step", "task_id": 3, "question": ..., "entry": {...trajectory entry...}}
+#   {"type": "done", "task_id": 3, "question": ..., "answer": {...}, "log": {...}}
+
+import json
+import os
+from pathlib import Path
+
+
+class RunJournal:
+    def __init__(self, path, resume=False, fsync=True):
+        self.path = Path(path)
+        self.fsync = fsync
+        self.done = {}
+        self.partial = {}
+
+        if resume and self.path.exists():
+            self._load()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._f = self.path.open("a" if resume else "w", encoding="utf-8")
+        if resume and self._f.tell() > 0 and not self._ends_with_newline():
+            self._f.write("\n")
+
+    def _load(self):
+        with self.path.open("r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    # 마지막 줄이 쓰다 만 상태로 끊긴 경우
+                    continue
+                key = (rec["task_id"], rec.get("question"))
+                if rec["type"] == "done":
+                    self.done[key] = rec
+                    self.partial.pop(key, None)
+                elif rec["type"] == "step" and key not in self.done:
+                    self.partial.setdefault(key, []).append(rec["entry"])
+
+    def _ends_with_newline(self):
+        with self.path.open("rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def _append(self, rec):
+        self._f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        self._f.flush()
+        if self.fsync:
+            os.fsync(self._f.fileno())
+
+    def finished(self, task_id, question):
+        return self.done.get((task_id, question))
+
+    def resume_traj(self, task_id, question):
+        return self.partial.get((task_id, question))
+
+    def step_writer(self, task_id, question):
+        def on_step(entry):
+            self._append({"type": "step", "task_id": task_id, "question": question, "entry": entry})
+        return on_step
+
+    def record_done(self, task_id, question, answer, log):
+        self._append({"type": "done", "task_id": task_id, "question": question, "answer": answer, "log": log})
+        self.done[(task_id, question)] = {"answer": answer, "log": log}
+        self.partial.pop((task_id, question), None)
+
+    def close(self):
+        self._f.close()
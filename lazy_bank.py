@@ -0,0 +1,625 @@
+# lazy_bank.py
+# 큰 ReasoningBank를 위한 지연 로딩 저장 형식 (bank 경로가 .jsonl 일 때 사용).
+#
+#   bank.jsonl            규칙 본문, append-only (규칙이 바뀌면 새 줄을 쓰고 index의 offset만 옮긴다)
+#   bank.jsonl.head.json  작은 header: version / rows / live / next_num
+#   bank.jsonl.idx        row마다 고정 길이 레코드 (offset, length, id, created, last_used, use_count, 통계, flags)
+#   bank.jsonl.tags/      태그별 posting 파일 (uint32 row 번호)
+#   bank.jsonl.fp.bin / .lsh.bin  중복 판별용 fingerprint / LSH band 키 (64bit 키 해시, row) 고정 길이 레코드
+#   bank.jsonl.sig        row마다 MinHash signature
+#
+# 시작할 때는 header만 읽는다. retrieve_rules는 질의 태그의 posting과 후보 row의 레코드만 읽고,
+# 실제로 고른 규칙의 본문만 디스크에서 가져온다. use_count 등 자주 바뀌는 값은 레코드를 제자리에서 갱신한다.
+
+import json
+import os
+import bisect
+import hashlib
+import shutil
+import struct
+import argparse
+import threading
+import time
+from array import array
+from datetime import datetime, timezone
+from pathlib import Path
+
+from reasoning_bank import (
+    MINHASH_PERMS,
+    ReasoningBank,
+    _tags_compatible,
+    consolidate_rules,
+    estimate_jaccard,
+    lsh_keys,
+    merge_rule,
+    minhash_signature,
+    rule_fingerprint,
+    rule_utility,
+)
+
+FORMAT_VERSION = 1
+
+# offset, length, id_num, created_ts, last_used_ts, use_count, tasks, answered, steps_sum, flags
+_REC = struct.Struct("<QIIddIIIII")
+_SIG = struct.Struct("<%dQ" % MINHASH_PERMS)
+# 중복 판별 키 레코드: 64bit 키 해시, row
+_KEY = struct.Struct("<QI")
+
+FLAG_DELETED = 0x1
+_POLARITY_CODES = {None: 0, "success": 1, "failure": 2}
+_OTHER_POLARITY = 255
+
+# 레코드 안에 따로 저장하고 본문에서는 빼는 필드
+_MUTABLE_FIELDS = ("use_count", "last_used_at", "stats")
+
+
+def _ts(iso):
+    if not iso:
+        return 0.0
+    try:
+        return datetime.fromisoformat(str(iso).rstrip("Z")).replace(tzinfo=timezone.utc).timestamp()
+    except ValueError:
+        return 0.0
+
+
+def _iso(ts):
+    if not ts:
+        return None
+    return datetime.fromtimestamp(ts, timezone.utc).replace(tzinfo=None).isoformat() + "Z"
+
+
+def _id_num(rule_id):
+    try:
+        return int(str(rule_id).split("_", 1)[1])
+    except (IndexError, ValueError):
+        return 0
+
+
+def _key_hash(key):
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class _KeyIndex:
+    # (키 해시, row) 레코드 파일을 키 해시로 정렬한 고정 폭 배열 두 개로 읽어 두고 이분 탐색으로 찾는다.
+    # 키마다 Python 객체(dict / list)를 만들지 않으므로 20k 규칙 x 16 band 도 수 MB 이다.
+    # 같은 키 안에서는 stable 정렬이라 기록된 순서가 유지된다.
+    def __init__(self, path):
+        data = path.read_bytes() if path.exists() else b""
+        data = data[:len(data) - len(data) % _KEY.size]
+        try:
+            import numpy as np
+        except ImportError:
+            np = None
+        self._np = np
+        if np is not None:
+            recs = np.frombuffer(data, dtype=np.dtype([("key", "<u8"), ("row", "<u4")]))
+            order = np.argsort(recs["key"], kind="stable")
+            self._keys = recs["key"][order]
+            self._rows = recs["row"][order]
+        else:
+            recs = list(_KEY.iter_unpack(data))
+            recs.sort(key=lambda kr: kr[0])
+            self._keys = array("Q", (k for k, _ in recs))
+            self._rows = array("I", (r for _, r in recs))
+        # 읽은 뒤 추가된 레코드 (정렬 배열을 매번 다시 만들지 않게 따로 모은다)
+        self._new = []
+
+    def add(self, key_hash, row):
+        self._new.append((key_hash, row))
+
+    def lookup(self, key_hash):
+        # 기록된 순서대로 row 목록
+        if self._np is not None:
+            h = self._np.uint64(key_hash)
+            lo = int(self._keys.searchsorted(h, "left"))
+            hi = int(self._keys.searchsorted(h, "right"))
+        else:
+            lo = bisect.bisect_left(self._keys, key_hash)
+            hi = bisect.bisect_right(self._keys, key_hash)
+        rows = [int(r) for r in self._rows[lo:hi]]
+        rows.extend(r for k, r in self._new if k == key_hash)
+        return rows
+
+
+class LazyReasoningBank:
+    def __init__(
+        self,
+        path="memory/bank.jsonl",
+        dedup=True,
+        near_dup_threshold=0.85,
+        capacity=None,
+        archive_path=None,
+    ):
+        self.path = Path(path)
+        self.dedup = dedup
+        self.near_dup_threshold = near_dup_threshold
+        self.capacity = capacity
+        self.archive_path = Path(archive_path) if archive_path else self.path.with_suffix(".archive.jsonl")
+        self._lock = threading.RLock()
+        self._head_path = Path(str(self.path) + ".head.json")
+        self._tags_dir = Path(str(self.path) + ".tags")
+        self._open()
+
+        if self.capacity is not None and self.header["live"] > self.capacity:
+            self.enforce_capacity()
+
+    # ---- 저수준 I/O ----
+
+    def _open(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._body_fd = os.open(str(self.path), os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+        self._idx_fd = os.open(str(self.path) + ".idx", os.O_RDWR | os.O_CREAT, 0o644)
+        self._sig_fd = os.open(str(self.path) + ".sig", os.O_RDWR | os.O_CREAT, 0o644)
+        self.header = self._read_header()
+        self._row_of = {}
+        self._dup = None
+
+    def _read_header(self):
+        if self._head_path.exists():
+            with self._head_path.open("r", encoding="utf-8") as f:
+                header = json.load(f)
+            if header.get("version") != FORMAT_VERSION:
+                raise RuntimeError("unsupported bank format version: %s" % header.get("version"))
+            return header
+        return {"version": FORMAT_VERSION, "rows": 0, "live": 0, "next_num": 1}
+
+    def _save_header(self):
+        tmp = self._head_path.with_name(self._head_path.name + ".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(self.header, f)
+        os.replace(tmp, self._head_path)
+
+    def _read_rec(self, row):
+        return list(_REC.unpack(os.pread(self._idx_fd, _REC.size, row * _REC.size)))
+
+    def _write_rec(self, row, rec):
+        os.pwrite(self._idx_fd, _REC.pack(*rec), row * _REC.size)
+
+    def _iter_recs(self, chunk_rows=4096):
+        rows = self.header["rows"]
+        for start in range(0, rows, chunk_rows):
+            n = min(chunk_rows, rows - start)
+            buf = os.pread(self._idx_fd, n * _REC.size, start * _REC.size)
+            for i in range(n):
+                yield start + i, list(_REC.unpack_from(buf, i * _REC.size))
+
+    def _append_body(self, body):
+        data = (json.dumps(body, ensure_ascii=False) + "\n").encode("utf-8")
+        offset = os.fstat(self._body_fd).st_size
+        os.write(self._body_fd, data)
+        return offset, len(data)
+
+    def _read_body(self, rec):
+        return json.loads(os.pread(self._body_fd, rec[1], rec[0]).decode("utf-8"))
+
+    def _rule_at(self, row, rec=None):
+        if rec is None:
+            rec = self._read_rec(row)
+        rule = self._read_body(rec)
+        rule["use_count"] = rec[5]
+        if rec[4]:
+            rule["last_used_at"] = _iso(rec[4])
+        if rec[6]:
+            rule["stats"] = {"tasks": rec[6], "answered": rec[7], "steps_sum": rec[8]}
+        self._row_of[rule.get("id")] = row
+        return rule
+
+    def _posting_path(self, tag):
+        return self._tags_dir / (tag.encode("utf-8").hex() + ".u32")
+
+    def _posting(self, tag):
+        p = self._posting_path(tag)
+        rows = array("I")
+        if p.exists():
+            rows.frombytes(p.read_bytes())
+        return rows
+
+    def _append_postings(self, row, tags):
+        self._tags_dir.mkdir(parents=True, exist_ok=True)
+        for t in tags:
+            with self._posting_path(t).open("ab") as f:
+                f.write(array("I", [row]).tobytes())
+
+    @staticmethod
+    def _lower_tags(tags):
+        out = []
+        for t in tags:
+            t = str(t).lower()
+            if t not in out:
+                out.append(t)
+        return out
+
+    @staticmethod
+    def _polarity_code(polarity):
+        return _POLARITY_CODES.get(polarity, _OTHER_POLARITY)
+
+    def _polarity_matches(self, rec, polarity):
+        code = (rec[9] >> 8) & 0xFF
+        if code != _OTHER_POLARITY:
+            return code == self._polarity_code(polarity)
+        return self._read_body(rec).get("polarity") == polarity
+
+    # ---- 규칙 추가 ----
+
+    def _append_rule(self, rule):
+        # 중복 판별 / 용량 제한 없이 새 row로 기록
+        if "id" not in rule:
+            rule["id"] = "rb_%04d" % self.header["next_num"]
+        self.header["next_num"] = max(self.header["next_num"], _id_num(rule["id"]) + 1)
+        if "created_at" not in rule:
+            rule["created_at"] = datetime.utcnow().isoformat() + "Z"
+
+        body = {k: v for k, v in rule.items() if k not in _MUTABLE_FIELDS}
+        offset, length = self._append_body(body)
+        stats = rule.get("stats", {})
+        row = self.header["rows"]
+        rec = [
+            offset,
+            length,
+            _id_num(rule["id"]),
+            _ts(rule.get("created_at")),
+            _ts(rule.get("last_used_at")),
+            int(rule.get("use_count", 0)),
+            int(stats.get("tasks", 0)),
+            int(stats.get("answered", 0)),
+            int(stats.get("steps_sum", 0)),
+            self._polarity_code(rule.get("polarity")) << 8,
+        ]
+        self._write_rec(row, rec)
+        self._append_postings(row, self._lower_tags(rule.get("tags", [])))
+        self._dup_append(row, rule)
+        self.header["rows"] += 1
+        self.header["live"] += 1
+        self._row_of[rule["id"]] = row
+        return row
+
+    def add_rule(self, rule):
+        with self._lock:
+            if "use_count" not in rule:
+                rule["use_count"] = 0
+            # evidence는 리스트로 강제
+            ev = rule.get("evidence")
+            if isinstance(ev, str):
+                rule["evidence"] = [ev]
+            elif isinstance(ev, list):
+                rule["evidence"] = ev
+            else:
+                rule["evidence"] = []
+
+            if self.dedup:
+                row = self.find_duplicate(rule)
+                if row is not None:
+                    return self._merge_into(row, rule)
+
+            row = self._append_rule(rule)
+            self.enforce_capacity(keep_row=row, save=False)
+            self._save_header()
+            return rule
+
+    def _merge_into(self, row, rule):
+        rec = self._read_rec(row)
+        canonical = self._rule_at(row, rec)
+        old_tags = set(self._lower_tags(canonical.get("tags", [])))
+        merge_rule(canonical, rule)
+
+        body = {k: v for k, v in canonical.items() if k not in _MUTABLE_FIELDS}
+        rec[0], rec[1] = self._append_body(body)
+        rec[5] = int(canonical["use_count"])
+        self._write_rec(row, rec)
+        new_tags = [t for t in self._lower_tags(canonical.get("tags", [])) if t not in old_tags]
+        self._append_postings(row, new_tags)
+        self._dup_refresh(row, canonical)
+        return canonical
+
+    # ---- 중복 판별 인덱스 (파일에 누적, 추가할 때만 메모리로 읽음) ----
+
+    def _key_path(self, name):
+        return Path(str(self.path) + name + ".bin")
+
+    def _append_keys(self, name, pairs):
+        with self._key_path(name).open("ab") as f:
+            f.write(b"".join(_KEY.pack(k, r) for k, r in pairs))
+        if self._dup is not None:
+            for k, r in pairs:
+                self._dup[name].add(k, r)
+
+    def _dup_append(self, row, rule):
+        sig = minhash_signature(rule)
+        self._append_keys(".fp", [(_key_hash(rule_fingerprint(rule)), row)])
+        self._append_keys(".lsh", [(_key_hash(k), row) for k in lsh_keys(sig)])
+        os.pwrite(self._sig_fd, _SIG.pack(*sig), row * _SIG.size)
+
+    def _dup_refresh(self, row, rule):
+        self._append_keys(".fp", [(_key_hash(rule_fingerprint(rule)), row)])
+
+    def _migrate_text_keys(self):
+        # 이전 형식(.fp / .lsh 텍스트 "키 row" 줄)이 남아 있으면 한 번만 바이너리 레코드로 옮긴다
+        for name in (".fp", ".lsh"):
+            old = Path(str(self.path) + name)
+            if not old.exists() or self._key_path(name).exists():
+                continue
+            with old.open("r", encoding="utf-8") as f, self._key_path(name).open("wb") as out:
+                for line in f:
+                    key, row = line.rsplit(" ", 1)
+                    out.write(_KEY.pack(_key_hash(key), int(row)))
+            old.unlink()
+
+    def _dup_load(self):
+        if self._dup is not None:
+            return self._dup
+        self._migrate_text_keys()
+        self._dup = {name: _KeyIndex(self._key_path(name)) for name in (".fp", ".lsh")}
+        return self._dup
+
+    def find_duplicate(self, rule):
+        dup = self._dup_load()
+        for row in dup[".fp"].lookup(_key_hash(rule_fingerprint(rule))):
+            if not self._read_rec(row)[9] & FLAG_DELETED:
+                return row
+
+        sig = minhash_signature(rule)
+        best, best_sim = None, 0.0
+        seen = set()
+        for key in lsh_keys(sig):
+            for cand in dup[".lsh"].lookup(_key_hash(key)):
+                if cand in seen:
+                    continue
+                seen.add(cand)
+                rec = self._read_rec(cand)
+                if rec[9] & FLAG_DELETED:
+                    continue
+                cand_sig = list(_SIG.unpack(os.pread(self._sig_fd, _SIG.size, cand * _SIG.size)))
+                sim = estimate_jaccard(sig, cand_sig)
+                if sim < self.near_dup_threshold or sim <= best_sim:
+                    continue
+                body = self._read_body(rec)
+                if body.get("polarity") != rule.get("polarity"):
+                    continue
+                if not _tags_compatible(body.get("tags", []), rule.get("tags", [])):
+                    continue
+                best, best_sim = cand, sim
+        return best
+
+    # ---- 조회 ----
+
+    def retrieve_rules(self, tags=None, polarity=None, max_rules=2):
+        with self._lock:
+            if self.header["live"] == 0:
+                return []
+
+            if tags is None:
+                tags = []
+            tags = [t.lower() for t in tags]
+
+            picked = []
+            if tags:
+                scores = {}
+                for t in tags:
+                    for row in self._posting(t):
+                        scores[row] = scores.get(row, 0) + 1
+                # 점수 내림차순, 같은 점수면 먼저 추가된 규칙 우선 (기존 ReasoningBank와 같은 순서)
+                for row in sorted(scores, key=lambda r: (-scores[r], r)):
+                    if len(picked) >= max_rules:
+                        break
+                    rec = self._read_rec(row)
+                    if rec[9] & FLAG_DELETED:
+                        continue
+                    if polarity is not None and not self._polarity_matches(rec, polarity):
+                        continue
+                    picked.append((row, rec))
+            else:
+                for row, rec in self._iter_recs():
+                    if len(picked) >= max_rules:
+                        break
+                    if rec[9] & FLAG_DELETED:
+                        continue
+                    if polarity is not None and not self._polarity_matches(rec, polarity):
+                        continue
+                    picked.append((row, rec))
+
+            now = time.time()
+            rules = []
+            for row, rec in picked:
+                rec[5] += 1
+                rec[4] = now
+                self._write_rec(row, rec)
+                rules.append(self._rule_at(row, rec))
+            return rules
+
+    def get_rule(self, rule_id):
+        with self._lock:
+            row = self._find_row(rule_id)
+            return None if row is None else self._rule_at(row)
+
+    def iter_rules(self):
+        for row, rec in self._iter_recs():
+            if not rec[9] & FLAG_DELETED:
+                yield self._rule_at(row, rec)
+
+    def __len__(self):
+        return self.header["live"]
+
+    def _find_row(self, rule_id):
+        row = self._row_of.get(rule_id)
+        if row is not None:
+            return row
+        num = _id_num(rule_id)
+        for row, rec in self._iter_recs():
+            if rec[2] == num and not rec[9] & FLAG_DELETED:
+                self._row_of[rule_id] = row
+                return row
+        return None
+
+    # ---- 사용 결과 기록 / eviction ----
+
+    def record_outcome(self, rule_ids, judgment, steps):
+        with self._lock:
+            for rid in set(rule_ids):
+                row = self._find_row(rid)
+                if row is None:
+                    continue
+                rec = self._read_rec(row)
+                rec[6] += 1
+                rec[7] += 1 if judgment == "answered" else 0
+                rec[8] += int(steps)
+                self._write_rec(row, rec)
+
+    def mark_used(self, rule_ids):
+        with self._lock:
+            counts = {}
+            for rid in rule_ids:
+                counts[rid] = counts.get(rid, 0) + 1
+            now = time.time()
+            for rid, n in counts.items():
+                row = self._find_row(rid)
+                if row is None:
+                    continue
+                rec = self._read_rec(row)
+                rec[5] += n
+                rec[4] = now
+                self._write_rec(row, rec)
+
+    def enforce_capacity(self, keep_row=None, save=True):
+        with self._lock:
+            if self.capacity is None or self.header["live"] <= self.capacity:
+                return []
+            live = [(row, rec) for row, rec in self._iter_recs() if not rec[9] & FLAG_DELETED]
+            max_use = max([rec[5] for _, rec in live] or [1])
+            tasks = sum(rec[6] for _, rec in live)
+            g = sum(rec[8] for _, rec in live) / float(tasks) if tasks else None
+            now = datetime.utcnow()
+
+            scored = []
+            for row, rec in live:
+                if row == keep_row:
+                    continue
+                view = {
+                    "use_count": rec[5],
+                    "created_at": _iso(rec[3]),
+                    "last_used_at": _iso(rec[4]),
+                    "stats": {"tasks": rec[6], "answered": rec[7], "steps_sum": rec[8]},
+                }
+                scored.append((rule_utility(view, now, max_use, g), row, rec))
+            scored.sort(key=lambda x: x[0])
+            n_evict = self.header["live"] - self.capacity
+
+            evicted = []
+            self.archive_path.parent.mkdir(parents=True, exist_ok=True)
+            with self.archive_path.open("a", encoding="utf-8") as f:
+                for u, row, rec in scored[:n_evict]:
+                    rule = self._rule_at(row, rec)
+                    out = dict(rule, evicted_at=datetime.utcnow().isoformat() + "Z", utility=round(u, 4))
+                    f.write(json.dumps(out, ensure_ascii=False) + "\n")
+                    rec[9] |= FLAG_DELETED
+                    self._write_rec(row, rec)
+                    self._row_of.pop(rule.get("id"), None)
+                    evicted.append(rule)
+            self.header["live"] -= len(evicted)
+            if save:
+                self._save_header()
+            return evicted
+
+    def restore(self, rule_id):
+        with self._lock:
+            if not self.archive_path.exists():
+                return None
+            with self.archive_path.open("r", encoding="utf-8") as f:
+                archived = [json.loads(line) for line in f if line.strip()]
+            found = None
+            for r in archived:
+                if r.get("id") == rule_id:
+                    found = r
+            if found is None:
+                return None
+            with self.archive_path.open("w", encoding="utf-8") as f:
+                for r in archived:
+                    if r.get("id") != rule_id:
+                        f.write(json.dumps(r, ensure_ascii=False) + "\n")
+
+            found.pop("evicted_at", None)
+            found.pop("utility", None)
+            # 복원한 규칙이 바로 다시 밀려나지 않도록 최근 사용으로 취급
+            found["last_used_at"] = datetime.utcnow().isoformat() + "Z"
+            row = self._append_rule(found)
+            self.enforce_capacity(keep_row=row, save=False)
+            self._save_header()
+            return found
+
+    # ---- 정리 / 변환 ----
+
+    def compact(self, save=True):
+        # 살아 있는 규칙만 모아 중복 병합 후 새 파일로 다시 쓴다 (덮어쓴 본문 줄, 삭제된 row 제거)
+        with self._lock:
+            rules = list(self.iter_rules())
+            before = len(rules)
+            rules = consolidate_rules(rules, self.near_dup_threshold)
+            if save:
+                self._rewrite(rules)
+            return before, len(rules)
+
+    def _rewrite(self, rules):
+        tmp_path = self.path.with_name(self.path.name + ".compact")
+        for p in _bank_files(tmp_path):
+            _remove(p)
+        tmp = LazyReasoningBank(tmp_path, dedup=False, archive_path=self.archive_path)
+        tmp.header["next_num"] = self.header["next_num"]
+        for r in rules:
+            tmp._append_rule(r)
+        tmp._save_header()
+        tmp.close()
+
+        self.close()
+        for src, dst in zip(_bank_files(tmp_path), _bank_files(self.path)):
+            _remove(dst)
+            if src.exists():
+                os.replace(src, dst)
+        self._open()
+
+    def close(self):
+        for fd in (self._body_fd, self._idx_fd, self._sig_fd):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+def _bank_files(path):
+    s = str(path)
+    return [Path(s), Path(s + ".head.json"), Path(s + ".idx"), Path(s + ".sig"),
+            Path(s + ".fp.bin"), Path(s + ".lsh.bin"), Path(s + ".tags"),
+            # 이전 형식의 텍스트 키 파일
+            Path(s + ".fp"), Path(s + ".lsh")]
+
+
+def _remove(p):
+    if p.is_dir():
+        shutil.rmtree(p)
+    elif p.exists():
+        p.unlink()
+
+
+def convert(json_path, jsonl_path):
+    # 기존 bank.json(list) -> 지연 로딩 형식
+    src = ReasoningBank(json_path, dedup=False)
+    for p in _bank_files(jsonl_path):
+        _remove(p)
+    dst = LazyReasoningBank(jsonl_path, dedup=False)
+    for r in src.rules:
+        dst._append_rule(dict(r))
+    dst._save_header()
+    dst.close()
+    return len(src.rules)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=["convert"])
+    parser.add_argument("src", type=str, help="legacy bank.json")
+    parser.add_argument("dst", type=str, help="new bank .jsonl path")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    n = convert(args.src, args.dst)
+    print("converted %d rules to %s" % (n, args.dst))
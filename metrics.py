@@ -0,0 +1,146 @@
+# metrics.py
+
+import json
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+
+PHASES = ["prompt_build", "model_call", "parse", "tool", "reflection", "bank"]
+
+
+def approx_tokens(text):
+    # usage 정보가 없을 때(mock 등) 쓰는 대략적인 추정치: 영어 기준 ~4 chars/token
+    if not text:
+        return 0
+    return max(1, len(text) // 4)
+
+
+class StepMetrics:
+    def __init__(self):
+        self.timings = {}
+        self.tokens = {"prompt": 0, "completion": 0, "estimated": False}
+        self.cache_hits = 0
+        self.tool_calls = 0
+        self.stream = None
+
+    @contextmanager
+    def phase(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            dt = (time.perf_counter() - t0) * 1000.0
+            self.timings[name] = round(self.timings.get(name, 0.0) + dt, 3)
+
+    def add_usage(self, prompt_tokens, completion_tokens, estimated=False):
+        self.tokens["prompt"] += int(prompt_tokens or 0)
+        self.tokens["completion"] += int(completion_tokens or 0)
+        if estimated:
+            self.tokens["estimated"] = True
+
+    def add_tool_call(self, cache_hit):
+        self.tool_calls += 1
+        if cache_hit:
+            self.cache_hits += 1
+
+    def set_stream(self, cut, first_token_ms, discarded_chars):
+        # streaming 호출: 턴이 끝난 뒤 남은 출력을 끊었는지, 첫 토큰까지 시간, 받고 버린 글자 수
+        self.stream = {"cut": cut, "first_token_ms": first_token_ms, "discarded_chars": discarded_chars}
+
+    def to_dict(self):
+        d = {
+            "timings_ms": dict(self.timings),
+            "tokens": dict(self.tokens),
+            "tool_calls": self.tool_calls,
+            "cache_hits": self.cache_hits,
+        }
+        if self.stream is not None:
+            d["stream"] = dict(self.stream)
+        return d
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    vals = sorted(values)
+    k = (len(vals) - 1) * q
+    lo = int(k)
+    hi = min(lo + 1, len(vals) - 1)
+    return vals[lo] + (vals[hi] - vals[lo]) * (k - lo)
+
+
+def count_steps(trajectory):
+    # reflection entry는 도구 step과 같은 step 번호를 쓰므로 entry 수가 아니라 step 번호로 센다.
+    # resume한 task는 journal에서 복원한 이전 step들도 trajectory에 들어 있고, self-consistency 로그는 sample별로 따로 센다.
+    return len({(entry.get("sample"), entry.get("step")) for entry in trajectory})
+
+
+def summarize_run(logs):
+    per_phase = {p: [] for p in PHASES}
+    per_task = []
+    totals = {"prompt_tokens": 0, "completion_tokens": 0, "model_calls": 0, "tool_calls": 0, "cache_hits": 0}
+
+    for log in logs:
+        task_ms = {p: 0.0 for p in PHASES}
+        for step_log in log.get("trajectory", []):
+            m = step_log.get("metrics")
+            if not m:
+                continue
+            for p, v in m.get("timings_ms", {}).items():
+                per_phase.setdefault(p, []).append(v)
+                task_ms[p] = task_ms.get(p, 0.0) + v
+            tok = m.get("tokens", {})
+            totals["prompt_tokens"] += tok.get("prompt", 0)
+            totals["completion_tokens"] += tok.get("completion", 0)
+            if "model_call" in m.get("timings_ms", {}):
+                totals["model_calls"] += 1
+            totals["tool_calls"] += m.get("tool_calls", 0)
+            totals["cache_hits"] += m.get("cache_hits", 0)
+            if m.get("stream", {}).get("cut"):
+                totals["stream_cuts"] = totals.get("stream_cuts", 0) + 1
+        spec = log.get("speculation")
+        if spec:
+            totals["speculations"] = totals.get("speculations", 0) + 1
+            if spec["used"]:
+                totals["speculation_hits"] = totals.get("speculation_hits", 0) + 1
+            elif spec["wasted"] and spec["work_ms"] is not None:
+                totals["speculation_wasted_ms"] = round(totals.get("speculation_wasted_ms", 0.0) + spec["work_ms"], 3)
+        per_task.append(
+            {
+                "task_id": log.get("task_id"),
+                "steps": count_steps(log.get("trajectory", [])),
+                "wall_ms": log.get("wall_ms"),
+                "phase_ms": {p: round(v, 3) for p, v in task_ms.items()},
+            }
+        )
+
+    phases = {}
+    for p, vals in per_phase.items():
+        if not vals:
+            continue
+        phases[p] = {
+            "n": len(vals),
+            "p50_ms": round(percentile(vals, 0.50), 3),
+            "p95_ms": round(percentile(vals, 0.95), 3),
+            "total_ms": round(sum(vals), 3),
+        }
+
+    wall = [t["wall_ms"] for t in per_task if t["wall_ms"] is not None]
+    return {
+        "n_tasks": len(logs),
+        "phases": phases,
+        "task_wall_ms": {
+            "p50": round(percentile(wall, 0.50), 3) if wall else None,
+            "p95": round(percentile(wall, 0.95), 3) if wall else None,
+        },
+        "totals": totals,
+        "tasks": per_task,
+    }
+
+
+def write_run_summary(logs, path):
+    path = Path(path)
+    with path.open("w", encoding="utf-8") as f:
+        json.dump(summarize_run(logs), f, ensure_ascii=False, indent=2)
+    return path
@@ -0,0 +1,253 @@
+# profiler.py
+# runner의 --profile 옵션용 프로파일러. 결과는 flamegraph.pl / speedscope 에서 바로 읽는 collapsed-stack 형식
+# ("frame;frame;... value" 한 줄씩)으로 task별 파일과 run 전체 합계를 남긴다.
+# - sampling: 백그라운드 스레드가 interval 마다 모든 스레드의 stack을 샘플링 (도구 worker 스레드 포함, 값 = 샘플 수)
+# - tracing : sys.setprofile 로 모든 함수 호출/반환을 기록하는 결정적 프로파일러 (값 = self time, us)
+#             3.12 미만에서는 프로파일 시작 이후에 생긴 스레드와 현재 스레드만 추적된다.
+# - memory  : tracemalloc 으로 task 동안 할당되어 끝날 때까지 남아 있는 메모리를 traceback 별로 기록 (값 = bytes)
+
+import os
+import sys
+import time
+import threading
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+# 블로킹 대기 중인 스레드(큐/락/subprocess 대기)는 CPU를 쓰지 않으므로 sampling에서 제외
+_IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    # ThreadPoolExecutor worker가 C 구현 SimpleQueue.get 에서 대기 중인 경우
+    ("thread.py", "_worker"),
+}
+
+TOP_N = 30
+# tracemalloc traceback 깊이. 깊을수록 정확하지만 할당이 많은 구간(pandas import 등)이 크게 느려진다
+MEMORY_FRAMES = 10
+
+
+def _label(code):
+    return "%s (%s:%d)" % (code.co_name, os.path.basename(code.co_filename), code.co_firstlineno)
+
+
+def _thread_root(name):
+    # "tool-cpu_3" -> "tool-cpu" 처럼 pool 스레드 번호를 떼서 같은 역할끼리 합친다
+    head, _, tail = name.rpartition("_")
+    return head if head and tail.isdigit() else name
+
+
+def _write_collapsed(stacks, path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as f:
+        for stack, value in sorted(stacks.items(), key=lambda kv: -kv[1]):
+            if value > 0:
+                f.write("%s %d\n" % (stack, value))
+
+
+def _self_totals(stacks):
+    totals = Counter()
+    for stack, value in stacks.items():
+        totals[stack.rsplit(";", 1)[-1]] += value
+    return totals
+
+
+class SamplingProfiler:
+    unit = "samples"
+
+    def __init__(self, interval=0.005, include_idle=False):
+        self.interval = interval
+        self.include_idle = include_idle
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.stacks = Counter()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+    def _loop(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for tid, frame in sys._current_frames().items():
+                if tid == own:
+                    continue
+                code = frame.f_code
+                if not self.include_idle and (os.path.basename(code.co_filename), code.co_name) in _IDLE_LEAVES:
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(_label(frame.f_code))
+                    frame = frame.f_back
+                labels.append(_thread_root(names.get(tid, "thread")))
+                self.stacks[";".join(reversed(labels))] += 1
+
+
+class TracingProfiler:
+    unit = "us"
+
+    def __init__(self):
+        self.stacks = Counter()
+        self._states = {}
+        self._lock = threading.Lock()
+        self._active = False
+
+    def start(self):
+        self.stacks = Counter()
+        self._states = {}
+        self._active = True
+        set_all = getattr(threading, "setprofile_all_threads", None)
+        if set_all is not None:
+            set_all(self._hook)
+        else:
+            threading.setprofile(self._hook)
+            sys.setprofile(self._hook)
+
+    def stop(self):
+        self._active = False
+        unset_all = getattr(threading, "setprofile_all_threads", None)
+        if unset_all is not None:
+            unset_all(None)
+        else:
+            sys.setprofile(None)
+            threading.setprofile(None)
+        with self._lock:
+            for state in self._states.values():
+                self.stacks.update(state[1])
+        return self.stacks
+
+    def _state(self):
+        tid = threading.get_ident()
+        state = self._states.get(tid)
+        if state is None:
+            # [call stack, 이 스레드의 collapsed 합계]  스레드별로 따로 모아 stop 때 합친다
+            state = [[(_thread_root(threading.current_thread().name), 0.0, 0.0)], Counter()]
+            with self._lock:
+                self._states[tid] = state
+        return state
+
+    def _hook(self, frame, event, arg):
+        if not self._active:
+            # stop 이후 다른 스레드에 남아 있는 hook은 스스로 해제
+            sys.setprofile(None)
+            return
+        now = time.perf_counter()
+        stack, totals = self._state()
+        if event == "call":
+            stack.append((_label(frame.f_code), now, 0.0))
+        elif event == "c_call":
+            stack.append(("%s (builtin)" % getattr(arg, "__qualname__", getattr(arg, "__name__", "?")), now, 0.0))
+        elif event in ("return", "c_return", "c_exception"):
+            if len(stack) <= 1:
+                return
+            label, t0, child = stack.pop()
+            elapsed = now - t0
+            path = ";".join(entry[0] for entry in stack) + ";" + label
+            totals[path] += int((elapsed - child) * 1e6)
+            parent = stack[-1]
+            stack[-1] = (parent[0], parent[1], parent[2] + elapsed)
+
+
+class MemoryTracer:
+    unit = "bytes"
+
+    def __init__(self, nframes=MEMORY_FRAMES):
+        self.nframes = nframes
+
+    def start(self):
+        # task마다 새로 시작하면 끝날 때 snapshot에는 task 동안 할당되어 아직 살아 있는 블록만 남는다
+        # (snapshot 두 개를 compare_to 하는 것보다 훨씬 싸다)
+        tracemalloc.start(self.nframes)
+
+    def stop(self):
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        # 집계 중 생기는 할당까지 추적하면 크게 느려지므로 먼저 끈다
+        tracemalloc.stop()
+        skip = {tracemalloc.__file__, __file__}
+        stacks = Counter()
+        for stat in snapshot.statistics("traceback"):
+            if any(fr.filename in skip for fr in stat.traceback):
+                continue
+            labels = ["%s:%d" % (os.path.basename(fr.filename), fr.lineno) for fr in stat.traceback]
+            # tracemalloc traceback은 가장 최근 frame이 마지막이다
+            stacks[";".join(labels)] += stat.size
+        return stacks, peak
+
+
+class RunProfiler:
+    def __init__(self, kind="sampling", out_dir="profiles", interval_ms=5.0, memory=False):
+        if kind == "sampling":
+            self.cpu = SamplingProfiler(interval=interval_ms / 1000.0)
+        elif kind == "tracing":
+            self.cpu = TracingProfiler()
+        else:
+            raise ValueError("unknown profiler: %s" % kind)
+        self.kind = kind
+        self.out_dir = Path(out_dir)
+        self.memory = MemoryTracer() if memory else None
+        self.total = Counter()
+        self.total_alloc = Counter()
+        self.peaks = {}
+
+    @contextmanager
+    def task(self, task_id):
+        if self.memory is not None:
+            self.memory.start()
+        self.cpu.start()
+        try:
+            yield
+        finally:
+            stacks = self.cpu.stop()
+            self.total.update(stacks)
+            _write_collapsed(stacks, self.out_dir / ("task_%s.%s.collapsed" % (task_id, self.kind)))
+            if self.memory is not None:
+                alloc, peak = self.memory.stop()
+                self.total_alloc.update(alloc)
+                self.peaks[str(task_id)] = peak
+                _write_collapsed(alloc, self.out_dir / ("task_%s.alloc.collapsed" % task_id))
+
+    def close(self):
+        _write_collapsed(self.total, self.out_dir / ("all.%s.collapsed" % self.kind))
+        lines = ["# top self %s (%s)" % (self.cpu.unit, self.kind)]
+        for label, value in _self_totals(self.total).most_common(TOP_N):
+            lines.append("%12d  %s" % (value, label))
+        if self.memory is not None:
+            _write_collapsed(self.total_alloc, self.out_dir / "all.alloc.collapsed")
+            lines.append("")
+            lines.append("# top allocation sites (bytes still held at task end)")
+            for label, value in _self_totals(self.total_alloc).most_common(TOP_N):
+                lines.append("%12d  %s" % (value, label))
+            lines.append("")
+            lines.append("# peak traced memory per task (bytes)")
+            for task_id, peak in self.peaks.items():
+                lines.append("%12d  task %s" % (peak, task_id))
+        with (self.out_dir / "summary.txt").open("w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+
+class NullProfiler:
+    def task(self, task_id):
+        return nullcontext()
+
+    def close(self):
+        pass
+
+
+def open_profiler(kind=None, out_dir="profiles", interval_ms=5.0, memory=False):
+    if kind is None:
+        if memory:
+            raise ValueError("--profile_memory requires --profile")
+        return NullProfiler()
+    return RunProfiler(kind, out_dir=out_dir, interval_ms=interval_ms, memory=memory)
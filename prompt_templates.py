@@ -1,17 +1,40 @@
 import json
 
+from tool_registry import REGISTRY
+
+
+def render_history(traj):
+    history = ""
+    for step_log in traj:
+        history += "Step %d Thought:\n%s\n" % (step_log["step"], step_log["thought"])
+        action = step_log["action"]
+        if action is not None:
+            if isinstance(action, list):
+                # 한 턴에 여러 Action을 실행한 step: action / observation이 같은 순서의 리스트
+                observations = step_log["observation"]
+                if not isinstance(observations, list):
+                    observations = [observations] * len(action)
+                pairs = zip(action, observations)
+            else:
+                pairs = [(action, step_log["observation"])]
+            for a, obs in pairs:
+                history += "Action: %s\n" % a
+                history += "Observation: %s\n" % json.dumps(obs, ensure_ascii=False)
+        history += "\n"
+    return history
+
+
 REACT_PROMPT_TEMPLATE = """You are a tool-using agent.
 
 You have access to the following tools:
-1) python_exec(path): execute a Python script and extract the final numeric output.
-2) xlsx_query(path, query): query an Excel spreadsheet and compute useful aggregates.
+{tool_docs}
 
 You should follow the ReAct style:
 - Start with `Thought:` when you reason.
-- When you want to use a tool, output a single line starting with `Action:`.
-  The Action must be exactly one of the following forms:
-    Action: python_exec("<path>")
-    Action: xlsx_query("<path>", "<query>")
+- When you want to use a tool, output a line starting with `Action:`.
+  For independent tool calls you may output several `Action:` lines in one turn; they run in parallel.
+  Each Action must be exactly one of the following forms:
+{action_forms}
 - When you are confident about the final result, output a line starting with `Answer:`.
 
 Question: {question}
@@ -26,15 +49,11 @@ Now continue with your next Thought (and possibly Action or Answer).
 
 
 def build_react_prompt(question, file_path, traj, reflections_used):
-    history = ""
-    for step_log in traj:
-        history += "Step %d Thought:\n%s\n" % (step_log["step"], step_log["thought"])
-        if step_log["action"] is not None:
-            history += "Action: %s\n" % step_log["action"]
-            history += "Observation: %s\n" % json.dumps(step_log["observation"], ensure_ascii=False)
-        history += "\n"
+    history = render_history(traj)
 
     prompt = REACT_PROMPT_TEMPLATE.format(
+        tool_docs=REGISTRY.render_tool_docs(),
+        action_forms=REGISTRY.render_action_forms(),
         question=question,
         file_path=file_path,
         history=history,
@@ -46,15 +65,14 @@ def build_react_prompt(question, file_path, traj, reflections_used):
 ENHANCED_REACT_PROMPT_TEMPLATE = """You are a tool-using agent.
 
 You have access to the following tools:
-1) python_exec(path): execute a Python script and extract the final numeric output.
-2) xlsx_query(path, query): query an Excel spreadsheet and compute useful aggregates.
+{tool_docs}
 
 You should follow the ReAct style:
 - Start with `Thought:` when you reason.
-- When you want to use a tool, output a single line starting with `Action:`.
-  The Action must be exactly one of the following forms:
-    Action: python_exec("<path>")
-    Action: xlsx_query("<path>", "<query>")
+- When you want to use a tool, output a line starting with `Action:`.
+  For independent tool calls you may output several `Action:` lines in one turn; they run in parallel.
+  Each Action must be exactly one of the following forms:
+{action_forms}
 - When you are confident about the final result, output a line starting with `Answer:`.
 
 Here are some past reasoning strategies you may find useful:
@@ -72,13 +90,7 @@ Now continue with your next Thought (and possibly Action or Answer).
 
 
 def build_react_prompt_enhanced(question, file_path, traj, reflections_used, rules):
-    history = ""
-    for step_log in traj:
-        history += "Step %d Thought:\n%s\n" % (step_log["step"], step_log["thought"])
-        if step_log["action"] is not None:
-            history += "Action: %s\n" % step_log["action"]
-            history += "Observation: %s\n" % json.dumps(step_log["observation"], ensure_ascii=False)
-        history += "\n"
+    history = render_history(traj)
 
     if not rules:
         rules_block = "(no prior rules available for this task)\n"
@@ -98,5 +110,7 @@ def build_react_prompt_enhanced(question, file_path, traj, reflections_used, rul
         history=history,
         reflections_used=reflections_used,
         rules_block=rules_block,
+        tool_docs=REGISTRY.render_tool_docs(),
+        action_forms=REGISTRY.render_action_forms(),
     )
     return prompt
@@ -1,15 +1,272 @@
 # reasoning_bank.py
 
 import json
+import math
+import random
+import hashlib
+import argparse
+import threading
+import zlib
 from pathlib import Path
 from datetime import datetime
 
 
+# ---- 규칙 중복 판별 (exact fingerprint + MinHash/LSH) ----
+
+MINHASH_PERMS = 64
+LSH_BANDS = 16
+LSH_ROWS = MINHASH_PERMS // LSH_BANDS
+SHINGLE_SIZE = 5
+_MERSENNE = (1 << 61) - 1
+
+_rng = random.Random(20251124)
+_PERMS = [(_rng.randrange(1, _MERSENNE), _rng.randrange(0, _MERSENNE)) for _ in range(MINHASH_PERMS)]
+
+
+def _norm_text(s):
+    return " ".join(str(s).lower().split())
+
+
+def rule_fingerprint(rule):
+    # id / use_count / evidence / created_at 같은 메타데이터를 제외한 규칙 본문의 해시
+    body = {
+        "content": [_norm_text(c) for c in rule.get("content", [])],
+        "polarity": rule.get("polarity"),
+        "tags": sorted(str(t).lower() for t in rule.get("tags", [])),
+    }
+    return hashlib.sha1(json.dumps(body, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+_perm_arrays = None
+
+
+def _minhash_numpy(np, hashes):
+    # (a * h + b) mod (2^61 - 1) 를 uint64 로 정확히 계산 (순수 Python 루프보다 수십 배 빠름).
+    # a = a1 * 2^32 + a0 로 나누면 a0 * h < 2^64, a1 * h < 2^61 이라 넘치지 않고,
+    # 2^61 ≡ 1 (mod p) 이므로 (a1 * h) * 2^32 는 (y >> 29) + ((y & (2^29 - 1)) << 32) 와 합동이다.
+    global _perm_arrays
+    if _perm_arrays is None:
+        a = np.array([p[0] for p in _PERMS], dtype=np.uint64)[:, None]
+        b = np.array([p[1] for p in _PERMS], dtype=np.uint64)[:, None]
+        _perm_arrays = (a & np.uint64(0xFFFFFFFF), a >> np.uint64(32), b)
+    a0, a1, b = _perm_arrays
+    p = np.uint64(_MERSENNE)
+    s61 = np.uint64(61)
+
+    def reduce(x):
+        return (x & p) + (x >> s61)
+
+    h = np.array(hashes, dtype=np.uint64)[None, :]
+    y = a1 * h
+    hi = (y >> np.uint64(29)) + ((y & np.uint64((1 << 29) - 1)) << np.uint64(32))
+    x = reduce(reduce(a0 * h) + reduce(hi) + b)
+    x = np.where(x >= p, x - p, x)
+    return [int(v) for v in x.min(axis=1)]
+
+
+def minhash_signature(rule):
+    text = _norm_text(rule.get("title", "")) + " | " + " ".join(_norm_text(c) for c in rule.get("content", []))
+    if len(text) < SHINGLE_SIZE:
+        shingles = {text}
+    else:
+        shingles = {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+    hashes = [zlib.crc32(s.encode("utf-8")) for s in shingles]
+    try:
+        # numpy는 import가 무거워 규칙을 추가할 때(중복 판별)만 가져온다
+        import numpy as np
+    except ImportError:
+        return [min((a * h + b) % _MERSENNE for h in hashes) for a, b in _PERMS]
+    return _minhash_numpy(np, hashes)
+
+
+def lsh_keys(sig):
+    return ["%d:%s" % (i, ",".join(str(v) for v in sig[i * LSH_ROWS:(i + 1) * LSH_ROWS])) for i in range(LSH_BANDS)]
+
+
+def estimate_jaccard(sig_a, sig_b):
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / float(len(sig_a))
+
+
+def _tags_compatible(a, b):
+    sa = {str(t).lower() for t in a}
+    sb = {str(t).lower() for t in b}
+    return sa <= sb or sb <= sa
+
+
+def merge_rule(canonical, dup):
+    # dup의 사용 이력/근거를 canonical에 합친다
+    canonical["use_count"] = int(canonical.get("use_count", 0)) + int(dup.get("use_count", 0))
+    evidence = list(canonical.get("evidence", []))
+    for ev in dup.get("evidence", []):
+        if ev not in evidence:
+            evidence.append(ev)
+    canonical["evidence"] = evidence
+    tags = list(canonical.get("tags", []))
+    lower = {str(t).lower() for t in tags}
+    for t in dup.get("tags", []):
+        if str(t).lower() not in lower:
+            tags.append(t)
+            lower.add(str(t).lower())
+    canonical["tags"] = tags
+    canonical["support"] = int(canonical.get("support", 1)) + int(dup.get("support", 1))
+    if dup.get("id"):
+        merged = canonical.setdefault("merged_ids", [])
+        merged.append(dup["id"])
+        merged.extend(dup.get("merged_ids", []))
+    return canonical
+
+
+class DupIndex:
+    # fingerprint -> 규칙, LSH band -> 후보 규칙 목록
+    def __init__(self, near_dup_threshold=0.85):
+        self.near_dup_threshold = near_dup_threshold
+        self._by_fp = {}
+        self._lsh = {}
+        self._sigs = {}
+        # remove()용: rule id -> 규칙, id(규칙) -> 등록한 fingerprint 목록
+        self._by_id = {}
+        self._fps = {}
+
+    def _add_fp(self, rule):
+        fp = rule_fingerprint(rule)
+        if self._by_fp.setdefault(fp, rule) is rule:
+            fps = self._fps.setdefault(id(rule), [])
+            if fp not in fps:
+                fps.append(fp)
+
+    def add(self, rule):
+        self._add_fp(rule)
+        sig = minhash_signature(rule)
+        self._sigs[id(rule)] = sig
+        for key in lsh_keys(sig):
+            self._lsh.setdefault(key, []).append(rule)
+        if rule.get("id"):
+            self._by_id[rule["id"]] = rule
+
+    def refresh(self, rule):
+        # 병합으로 태그가 늘었을 수 있으므로 fingerprint 인덱스에 새 키도 등록
+        self._add_fp(rule)
+
+    def remove(self, rule_id):
+        # eviction된 규칙을 fingerprint / LSH band / signature 표에서 뺀다 (인덱스 전체를 다시 만들지 않게)
+        rule = self._by_id.pop(rule_id, None)
+        if rule is None:
+            return
+        for fp in self._fps.pop(id(rule), []):
+            if self._by_fp.get(fp) is rule:
+                del self._by_fp[fp]
+        sig = self._sigs.pop(id(rule), None)
+        if sig is None:
+            return
+        for key in lsh_keys(sig):
+            bucket = [r for r in self._lsh.get(key, []) if r is not rule]
+            if bucket:
+                self._lsh[key] = bucket
+            else:
+                self._lsh.pop(key, None)
+
+    def find(self, rule):
+        canonical = self._by_fp.get(rule_fingerprint(rule))
+        if canonical is not None:
+            return canonical
+
+        sig = minhash_signature(rule)
+        best, best_sim = None, 0.0
+        seen = set()
+        for key in lsh_keys(sig):
+            for cand in self._lsh.get(key, []):
+                if id(cand) in seen:
+                    continue
+                seen.add(id(cand))
+                if cand.get("polarity") != rule.get("polarity"):
+                    continue
+                if not _tags_compatible(cand.get("tags", []), rule.get("tags", [])):
+                    continue
+                sim = estimate_jaccard(sig, self._sigs[id(cand)])
+                if sim >= self.near_dup_threshold and sim > best_sim:
+                    best, best_sim = cand, sim
+        return best
+
+
+def consolidate_rules(rules, near_dup_threshold=0.85):
+    # 규칙을 순서대로 다시 삽입하면서 exact / near 중복을 앞쪽 규칙에 병합
+    index = DupIndex(near_dup_threshold)
+    out = []
+    for r in rules:
+        canonical = index.find(r)
+        if canonical is not None:
+            merge_rule(canonical, r)
+            index.refresh(canonical)
+        else:
+            out.append(r)
+            index.add(r)
+    return out
+
+
+# ---- 용량 제한 / eviction ----
+
+RECENCY_HALF_LIFE_DAYS = 7.0
+UTILITY_WEIGHTS = {"recency": 0.3, "use": 0.3, "success": 0.4}
+
+
+def _now_iso():
+    return datetime.utcnow().isoformat() + "Z"
+
+
+def _parse_iso(ts):
+    try:
+        return datetime.fromisoformat(str(ts).rstrip("Z"))
+    except ValueError:
+        return None
+
+
+def rule_success(rule, global_avg_steps=None):
+    # 규칙을 참고한 task의 answered 비율 (Beta(1,1) smoothing) x step 효율 (전체 평균 대비)
+    st = rule.get("stats", {})
+    n = int(st.get("tasks", 0))
+    rate = (int(st.get("answered", 0)) + 1.0) / (n + 2.0)
+    if n == 0 or not global_avg_steps:
+        return rate
+    avg_steps = float(st.get("steps_sum", 0)) / n
+    if avg_steps <= 0:
+        return rate
+    efficiency = min(2.0, global_avg_steps / avg_steps) / 2.0
+    return 0.5 * rate + 0.5 * efficiency
+
+
+def rule_utility(rule, now=None, max_use=1, global_avg_steps=None):
+    now = now or datetime.utcnow()
+    last = _parse_iso(rule.get("last_used_at") or rule.get("created_at", "")) or now
+    age_days = max(0.0, (now - last).total_seconds() / 86400.0)
+    recency = 0.5 ** (age_days / RECENCY_HALF_LIFE_DAYS)
+    use = math.log1p(int(rule.get("use_count", 0))) / math.log1p(max(1, max_use))
+    success = rule_success(rule, global_avg_steps)
+    w = UTILITY_WEIGHTS
+    return w["recency"] * recency + w["use"] * use + w["success"] * success
+
+
 class ReasoningBank:
-    def __init__(self, path="memory/bank.json"):
+    def __init__(
+        self,
+        path="memory/bank.json",
+        dedup=True,
+        near_dup_threshold=0.85,
+        capacity=None,
+        archive_path=None,
+    ):
         self.path = Path(path)
         self.rules = []
+        self.dedup = dedup
+        self.near_dup_threshold = near_dup_threshold
+        self.capacity = capacity
+        # capacity를 넘어 밀려난 규칙은 cold archive(JSONL)에 보관했다가 restore 할 수 있다
+        self.archive_path = Path(archive_path) if archive_path else self.path.with_suffix(".archive.jsonl")
+        self._archived_max = None
+        # 같은 bank를 여러 trajectory 스레드가 함께 쓸 수 있도록 공개 메서드는 lock으로 감싼다
+        self._lock = threading.RLock()
         self._load()
+        if self.capacity is not None and len(self.rules) > self.capacity:
+            self.enforce_capacity()
 
     def _load(self):
         if self.path.exists():
@@ -20,6 +277,15 @@ class ReasoningBank:
                     self.rules = []
         else:
             self.rules = []
+        # 중복 판별 인덱스는 규칙을 추가할 때 처음 만든다 (조회만 하는 프로세스는 비용 없음)
+        self._dup = None
+
+    def _dup_index(self):
+        if self._dup is None:
+            self._dup = DupIndex(self.near_dup_threshold)
+            for r in self.rules:
+                self._dup.add(r)
+        return self._dup
 
     def _save(self):
         self.path.parent.mkdir(parents=True, exist_ok=True)
@@ -27,10 +293,8 @@ class ReasoningBank:
             json.dump(self.rules, f, ensure_ascii=False, indent=2)
 
     def _next_id(self):
-        # rb_0001, rb_0002 형식
-        if not self.rules:
-            return "rb_0001"
-        nums = []
+        # rb_0001, rb_0002 형식 (archive로 밀려난 id와도 겹치지 않게)
+        nums = [self._archived_max_num()]
         for r in self.rules:
             rid = r.get("id", "")
             if rid.startswith("rb_"):
@@ -39,61 +303,268 @@ class ReasoningBank:
                     nums.append(n)
                 except Exception:
                     pass
-        if not nums:
-            return "rb_0001"
         n = max(nums) + 1
         return "rb_%04d" % n
 
+    def _archived_max_num(self):
+        if self._archived_max is None:
+            self._archived_max = 0
+            for r in self._iter_archive():
+                try:
+                    self._archived_max = max(self._archived_max, int(r.get("id", "").split("_", 1)[1]))
+                except (IndexError, ValueError):
+                    pass
+        return self._archived_max
+
+    def _iter_archive(self):
+        if not self.archive_path.exists():
+            return
+        with self.archive_path.open("r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+    def find_duplicate(self, rule):
+        return self._dup_index().find(rule)
+
     def add_rule(self, rule):
-        if "id" not in rule:
-            rule["id"] = self._next_id()
-        if "use_count" not in rule:
-            rule["use_count"] = 0
-        if "created_at" not in rule:
-            rule["created_at"] = datetime.utcnow().isoformat() + "Z"
-        # evidence는 리스트로 강제
-        ev = rule.get("evidence")
-        if isinstance(ev, str):
-            rule["evidence"] = [ev]
-        elif isinstance(ev, list):
-            rule["evidence"] = ev
-        else:
-            rule["evidence"] = []
-        self.rules.append(rule)
-        self._save()
-        return rule
+        with self._lock:
+            if "use_count" not in rule:
+                rule["use_count"] = 0
+            # evidence는 리스트로 강제
+            ev = rule.get("evidence")
+            if isinstance(ev, str):
+                rule["evidence"] = [ev]
+            elif isinstance(ev, list):
+                rule["evidence"] = ev
+            else:
+                rule["evidence"] = []
 
-    def retrieve_rules(self, tags=None, polarity=None, max_rules=2):
-        if not self.rules:
-            return []
+            if self.dedup:
+                canonical = self.find_duplicate(rule)
+                if canonical is not None:
+                    merge_rule(canonical, rule)
+                    self._dup.refresh(canonical)
+                    self._save()
+                    return canonical
+
+            if "id" not in rule:
+                rule["id"] = self._next_id()
+            if "created_at" not in rule:
+                rule["created_at"] = datetime.utcnow().isoformat() + "Z"
+            self.rules.append(rule)
+            if self._dup is not None:
+                self._dup.add(rule)
+            self.enforce_capacity(keep=rule, save=False)
+            self._save()
+            return rule
 
-        if tags is None:
-            tags = []
-        tags = [t.lower() for t in tags]
+    # ---- 사용 결과 기록 / eviction ----
 
-        scored = []
-        for r in self.rules:
-            if polarity is not None:
-                if r.get("polarity") != polarity:
-                    continue
-            r_tags = [str(t).lower() for t in r.get("tags", [])]
-            score = 0
-            for t in tags:
-                if t in r_tags:
-                    score += 1
-            scored.append((score, r))
-
-        scored.sort(key=lambda x: x[0], reverse=True)
-        picked = []
-        for score, r in scored:
-            if len(picked) >= max_rules:
-                break
-            if score > 0 or not tags:
-                picked.append(r)
-
-        for r in picked:
-            r["use_count"] = int(r.get("use_count", 0)) + 1
-        if picked:
+    def record_outcome(self, rule_ids, judgment, steps):
+        # 해당 규칙들을 참고한 task가 answered로 끝났는지, 몇 step 걸렸는지 누적
+        with self._lock:
+            ids = set(rule_ids)
+            touched = False
+            for r in self.rules:
+                if r.get("id") in ids:
+                    st = r.setdefault("stats", {"tasks": 0, "answered": 0, "steps_sum": 0})
+                    st["tasks"] = int(st.get("tasks", 0)) + 1
+                    st["answered"] = int(st.get("answered", 0)) + (1 if judgment == "answered" else 0)
+                    st["steps_sum"] = int(st.get("steps_sum", 0)) + int(steps)
+                    touched = True
+            if touched:
+                self._save()
+
+    def __len__(self):
+        return len(self.rules)
+
+    def close(self):
+        # 변경마다 바로 저장하므로 정리할 것이 없다 (다른 bank 구현과 인터페이스만 맞춤)
+        pass
+
+    def mark_used(self, rule_ids):
+        # retrieve 없이 사용 횟수만 올린다 (bank 서버 클라이언트가 캐시로 응답한 조회를 몰아서 반영할 때)
+        with self._lock:
+            counts = {}
+            for rid in rule_ids:
+                counts[rid] = counts.get(rid, 0) + 1
+            now = _now_iso()
+            touched = False
+            for r in self.rules:
+                n = counts.get(r.get("id"))
+                if n:
+                    r["use_count"] = int(r.get("use_count", 0)) + n
+                    r["last_used_at"] = now
+                    touched = True
+            if touched:
+                self._save()
+
+    def _global_avg_steps(self):
+        n = sum(int(r.get("stats", {}).get("tasks", 0)) for r in self.rules)
+        if n == 0:
+            return None
+        return sum(int(r.get("stats", {}).get("steps_sum", 0)) for r in self.rules) / float(n)
+
+    def utilities(self):
+        now = datetime.utcnow()
+        max_use = max([int(r.get("use_count", 0)) for r in self.rules] or [1])
+        g = self._global_avg_steps()
+        return [(rule_utility(r, now, max_use, g), r) for r in self.rules]
+
+    def enforce_capacity(self, keep=None, save=True):
+        with self._lock:
+            if self.capacity is None or len(self.rules) <= self.capacity:
+                return []
+            scored = [(u, r) for u, r in self.utilities() if r is not keep]
+            scored.sort(key=lambda x: x[0])
+            n_evict = len(self.rules) - self.capacity
+            evicted = scored[:n_evict]
+            self._archive(evicted)
+            gone = {id(r) for _, r in evicted}
+            self.rules = [r for r in self.rules if id(r) not in gone]
+            if self._dup is not None:
+                for _, r in evicted:
+                    self._dup.remove(r.get("id"))
+            if save:
+                self._save()
+            return [r for _, r in evicted]
+
+    def _archive(self, scored_rules):
+        if not scored_rules:
+            return
+        self.archive_path.parent.mkdir(parents=True, exist_ok=True)
+        with self.archive_path.open("a", encoding="utf-8") as f:
+            for u, r in scored_rules:
+                rec = dict(r, evicted_at=_now_iso(), utility=round(u, 4))
+                f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+                try:
+                    num = int(r.get("id", "").split("_", 1)[1])
+                    self._archived_max = max(self._archived_max_num(), num)
+                except (IndexError, ValueError):
+                    pass
+
+    def restore(self, rule_id):
+        with self._lock:
+            archived = list(self._iter_archive())
+            found = None
+            for r in archived:
+                if r.get("id") == rule_id:
+                    found = r
+            if found is None:
+                return None
+            rest = [r for r in archived if r.get("id") != rule_id]
+            with self.archive_path.open("w", encoding="utf-8") as f:
+                for r in rest:
+                    f.write(json.dumps(r, ensure_ascii=False) + "\n")
+
+            found.pop("evicted_at", None)
+            found.pop("utility", None)
+            # 복원한 규칙이 바로 다시 밀려나지 않도록 최근 사용으로 취급
+            found["last_used_at"] = _now_iso()
+            self.rules.append(found)
+            if self._dup is not None:
+                self._dup.add(found)
+            self.enforce_capacity(keep=found, save=False)
             self._save()
+            return found
+
+    def compact(self, save=True):
+        with self._lock:
+            before = len(self.rules)
+            self.rules = consolidate_rules(self.rules, self.near_dup_threshold)
+            self._dup = None
+            if save:
+                self._save()
+            return before, len(self.rules)
+
+    def retrieve_rules(self, tags=None, polarity=None, max_rules=2):
+        with self._lock:
+            if not self.rules:
+                return []
+
+            if tags is None:
+                tags = []
+            tags = [t.lower() for t in tags]
+
+            scored = []
+            for r in self.rules:
+                if polarity is not None:
+                    if r.get("polarity") != polarity:
+                        continue
+                r_tags = [str(t).lower() for t in r.get("tags", [])]
+                score = 0
+                for t in tags:
+                    if t in r_tags:
+                        score += 1
+                scored.append((score, r))
+
+            scored.sort(key=lambda x: x[0], reverse=True)
+            picked = []
+            for score, r in scored:
+                if len(picked) >= max_rules:
+                    break
+                if score > 0 or not tags:
+                    picked.append(r)
+
+            now = _now_iso()
+            for r in picked:
+                r["use_count"] = int(r.get("use_count", 0)) + 1
+                r["last_used_at"] = now
+            if picked:
+                self._save()
+
+            return picked
+
+
+def open_bank(path="memory/bank.json", **kwargs):
+    # http:// 주소면 bank 서버 클라이언트(bank_server.BankClient),
+    # .jsonl 경로면 지연 로딩 형식(lazy_bank.LazyReasoningBank), 아니면 기존 JSON 리스트 형식
+    if str(path).startswith("http://"):
+        from bank_server import BankClient
+        return BankClient(str(path), **kwargs)
+    if str(path).endswith(".jsonl"):
+        from lazy_bank import LazyReasoningBank
+        return LazyReasoningBank(path, **kwargs)
+    return ReasoningBank(path, **kwargs)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=["compact", "evict", "restore"])
+    parser.add_argument("rule_id", nargs="?", help="rule id for restore")
+    parser.add_argument("--bank_path", type=str, default="memory/bank.json")
+    parser.add_argument("--threshold", type=float, default=0.85, help="MinHash Jaccard threshold for near duplicates")
+    parser.add_argument("--capacity", type=int, default=None)
+    parser.add_argument("--dry_run", action="store_true")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    # capacity를 주고 열면 열자마자 evict + 저장하므로 (--dry_run 무시) 명령에서 직접 적용한다
+    bank = open_bank(args.bank_path, near_dup_threshold=args.threshold)
+    bank.capacity = args.capacity
+
+    def evict(live):
+        if args.dry_run:
+            print("would evict %d rules (dry run)" % max(0, live - args.capacity))
+        else:
+            evicted = bank.enforce_capacity()
+            print("evicted %d rules to %s" % (len(evicted), bank.archive_path))
 
-        return picked
+    if args.command == "compact":
+        before, after = bank.compact(save=not args.dry_run)
+        print("rules: %d -> %d%s" % (before, after, " (dry run)" if args.dry_run else ""))
+        if args.capacity is not None:
+            evict(after)
+    elif args.command == "evict":
+        if args.capacity is None:
+            raise SystemExit("--capacity is required for evict")
+        evict(len(bank))
+    else:
+        if not args.rule_id:
+            raise SystemExit("rule_id is required for restore")
+        r = bank.restore(args.rule_id)
+        print("restored %s" % args.rule_id if r else "%s not found in archive" % args.rule_id)
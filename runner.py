@@ -0,0 +1,141 @@
+# runner.py
+# run_baseline.py / run_enhanced.py 공통 실행부.
+# CLI 옵션, 스케줄 / journal(--resume) / self-consistency / profiler / trajectory sink 연결과 결과 저장을 한 곳에서 처리한다.
+# 각 entry point는 모드별 옵션과 agent 생성만 담당한다.
+
+import json
+import argparse
+from concurrent.futures import wait
+from pathlib import Path
+
+from journal import RunJournal
+from metrics import write_run_summary
+from profiler import open_profiler
+from scheduler import iter_schedule
+from self_consistency import run_self_consistency
+from tool_registry import configure_python_exec
+from traj_sink import open_sink
+
+
+def build_parser(mode):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--api_key", type=str, required=False)
+    parser.add_argument("--model", type=str, default="gpt-4o-mini")
+    parser.add_argument("--tasks_path", type=str, default="test/사전과제.json")
+    parser.add_argument("--base_dir", type=str, default="test")
+    parser.add_argument("--run_id", type=int, default=0)
+    parser.add_argument("--mock", action="store_true")
+    parser.add_argument("--schedule", type=str, default="in_order", choices=["in_order", "by_file"])
+    parser.add_argument("--journal", type=str, default="answers_%s.journal.jsonl" % mode)
+    parser.add_argument("--resume", action="store_true", help="skip finished tasks and continue partial ones from the journal")
+    parser.add_argument("--traj_sink", type=str, default="per_task", choices=["per_task", "jsonl"])
+    parser.add_argument("--traj_path", type=str, default=None, help="jsonl sink path (.gz / .zst for compression)")
+    parser.add_argument("--samples", type=int, default=1, help="trajectories per task, majority vote over final answers")
+    parser.add_argument("--quorum", type=int, default=None, help="stop a task once this many samples agree (default: majority)")
+    parser.add_argument("--temperature", type=float, default=None)
+    parser.add_argument("--stream", action="store_true", help="stream completions and stop once the Action/Answer lines are complete")
+    parser.add_argument("--speculate", action="store_true", help="start the likely first tool on the task file before the first model call")
+    parser.add_argument("--profile", type=str, default=None, choices=["sampling", "tracing"], help="write collapsed-stack profiles per task")
+    parser.add_argument("--profile_dir", type=str, default="profiles/%s" % mode)
+    parser.add_argument("--profile_interval_ms", type=float, default=5.0)
+    parser.add_argument("--profile_memory", action="store_true", help="also trace allocations with tracemalloc")
+    parser.add_argument("--python_exec_timeout", type=float, default=None, help="kill python_exec scripts after this many seconds")
+    parser.add_argument("--cache_python_exec", action="store_true", help="reuse python_exec results for the same script (only for deterministic scripts)")
+    return parser
+
+
+def run(args, mode, make_agent):
+    # make_agent(**kwargs): 공통 설정을 받아 모드별 agent를 만든다
+    with open(args.tasks_path, "r", encoding="utf-8") as f:
+        tasks = json.load(f)
+
+    configure_python_exec(args.python_exec_timeout, args.cache_python_exec)
+    traj_path = args.traj_path or "runs/%s_%d.jsonl" % (mode, args.run_id)
+    sink = open_sink(args.traj_sink, traj_path=traj_path, resume=args.resume)
+    agent = make_agent(
+        mode=mode,
+        max_steps=8,
+        max_reflections=2,
+        model_name=args.model,
+        api_key=args.api_key,
+        mock=args.mock,
+        sink=sink,
+        temperature=args.temperature,
+        stream=args.stream,
+        speculate=args.speculate,
+    )
+
+    journal = RunJournal(args.journal, resume=args.resume)
+    profiler = open_profiler(args.profile, args.profile_dir, args.profile_interval_ms, args.profile_memory)
+    # samples > 1 이면 task마다 trajectory들을 동시에 실행.
+    # quorum 뒤에도 아직 멈추지 않은 sample은 여기 모아 두었다가 sink / bank를 닫기 전에 기다린다.
+    sampling = args.samples > 1
+    unfinished = []
+
+    answers = []
+    logs = []
+    try:
+        for idx, task in iter_schedule(tasks, args.schedule, args.base_dir):
+            question = task["question"]
+            file_name = task["file_name"]
+
+            done = journal.finished(idx, question)
+            if done is not None:
+                answers.append(done["answer"])
+                logs.append(done["log"])
+                continue
+
+            with profiler.task(idx):
+                if sampling:
+                    # 여러 sample이 섞인 step은 journal에 남기지 않는다 (resume 시 task를 처음부터 다시 실행)
+                    log = run_self_consistency(
+                        agent,
+                        task_id=idx,
+                        question=question,
+                        file_name=file_name,
+                        base_dir=args.base_dir,
+                        run_id=args.run_id,
+                        samples=args.samples,
+                        quorum=args.quorum,
+                        pending=unfinished,
+                    )
+                else:
+                    log = agent.run_single(
+                        task_id=idx,
+                        question=question,
+                        file_name=file_name,
+                        base_dir=args.base_dir,
+                        run_id=args.run_id,
+                        resume_traj=journal.resume_traj(idx, question),
+                        on_step=journal.step_writer(idx, question),
+                    )
+            logs.append(log)
+
+            answer = {
+                "task_id": idx,
+                "question": question,
+                "file_name": file_name,
+                "answer": log["final_answer"],
+                "judgment": log["judgment"],
+            }
+            if sampling:
+                answer["votes"] = log["votes"]
+            answers.append(answer)
+            journal.record_done(idx, question, answer, log)
+    finally:
+        journal.close()
+        wait(unfinished)
+        sink.close()
+        profiler.close()
+        agent.close()
+
+    # by_file 스케줄에서는 실행 순서가 달라지므로 task_id 순으로 정렬해서 저장
+    answers.sort(key=lambda a: a["task_id"])
+    logs.sort(key=lambda log: log["task_id"])
+
+    out_path = Path("answers_%s.json" % mode)
+    with out_path.open("w", encoding="utf-8") as f:
+        json.dump(answers, f, ensure_ascii=False, indent=2)
+
+    write_run_summary(logs, out_path.with_name("metrics_%s.json" % mode))
+    return answers
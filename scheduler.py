@@ -0,0 +1,118 @@
+# scheduler.py
+# task 실행 순서 결정.
+# - in_order: 기존처럼 목록 순서대로
+# - by_file : 같은 file_name을 쓰는 task끼리 묶고, 그룹마다 파일을 한 번만 preload.
+#             현재 그룹이 도는 동안 다음 그룹의 파일을 백그라운드에서 미리 읽는다.
+# Speculation: task 하나의 첫 모델 호출을 기다리는 동안 그 task 파일에 대한 첫 도구 작업을 미리 시작한다.
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from tool_registry import REGISTRY
+from tools import workbook_entry
+
+
+def group_by_file(tasks):
+    # 처음 등장한 순서를 유지하는 file_name -> [(task_id, task)] 그룹
+    groups = {}
+    for idx, task in enumerate(tasks, start=1):
+        groups.setdefault(task["file_name"], []).append((idx, task))
+    return list(groups.items())
+
+
+def preload_file(path):
+    # -> (캐시 entry, 이 호출이 작업을 시작했는지). 미리 읽기는 캐시 재사용 횟수에 넣지 않는다
+    path = str(path)
+    if path.endswith(".xlsx"):
+        return workbook_entry(path, count_hit=False)
+    if path.endswith(".py"):
+        # 결과는 tool registry 캐시에 남아 같은 경로의 python_exec가 재사용한다
+        return REGISTRY.prefetch("python_exec", path)
+    return None, False
+
+
+def iter_schedule(tasks, schedule="in_order", base_dir=".", prefetch=True):
+    if schedule == "in_order":
+        for idx, task in enumerate(tasks, start=1):
+            yield idx, task
+        return
+    if schedule != "by_file":
+        raise ValueError("unknown schedule: %s" % schedule)
+
+    groups = group_by_file(tasks)
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch") as pool:
+        pending = None
+        if groups:
+            pending = pool.submit(preload_file, Path(base_dir) / groups[0][0])
+        for i, (file_name, members) in enumerate(groups):
+            current = pending
+            pending = None
+            if prefetch and i + 1 < len(groups):
+                pending = pool.submit(preload_file, Path(base_dir) / groups[i + 1][0])
+            try:
+                current.result()
+            except Exception:
+                # preload 실패는 무시하고 실제 도구 호출에서 에러를 관찰하게 둔다
+                pass
+            for idx, task in members:
+                yield idx, task
+            if pending is None and i + 1 < len(groups):
+                pending = pool.submit(preload_file, Path(base_dir) / groups[i + 1][0])
+
+
+# 추측 실행용 pool. python_exec 추측은 이 스레드에서 registry 결과를 기다리므로 도구 pool과 분리한다.
+_speculation_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="speculate")
+
+
+def likely_first_tool(path):
+    path = str(path)
+    if path.endswith(".xlsx"):
+        return "xlsx_query"
+    if path.endswith(".py") and REGISTRY.get("python_exec").cacheable:
+        # 캐시하지 않으면 미리 실행한 결과를 실제 호출이 가져갈 수 없다
+        return "python_exec"
+    return None
+
+
+class Speculation:
+    # xlsx면 workbook을 파싱해 캐시에 올리고, py면 python_exec를 registry 캐시로 미리 실행(도구 timeout 적용).
+    # 실제 도구 호출이 캐시에서 그 결과를 가져가면(파싱 / 실행 중이었다면 끝나길 기다려서) 사용, 아니면 낭비로 기록한다.
+    def __init__(self, path):
+        self.path = str(path)
+        self.tool = likely_first_tool(self.path)
+        self.work_ms = None
+        self.error = None
+        self.entry = None
+        self.started = False
+        self._t0 = time.perf_counter()
+        self.future = _speculation_pool.submit(self._run) if self.tool is not None else None
+
+    def _run(self):
+        try:
+            self.entry, self.started = preload_file(self.path)
+        except Exception as e:
+            self.error = type(e).__name__
+        finally:
+            self.work_ms = round((time.perf_counter() - self._t0) * 1000.0, 3)
+
+    def finish(self):
+        if self.tool is None:
+            return None
+        # pool에서 아직 대기 중이면 실행하지 않고 취소
+        cancelled = self.future.cancel()
+        running = not cancelled and not self.future.done()
+        # 이미 캐시에 있던 결과를 가져왔을 뿐이면(started=False) 한 일이 없으므로 사용도 낭비도 아니다.
+        # 아직 실행 중이면 실제 호출이 그 결과를 기다리지 않았다는 뜻이므로 낭비로 본다.
+        started = running or self.started
+        used = not running and self.started and self.entry["hits"] > 0
+        return {
+            "tool": self.tool,
+            "path": self.path,
+            "started": started,
+            "used": used,
+            # 아직 실행 중이면 None (task가 먼저 끝남)
+            "work_ms": self.work_ms,
+            "wasted": started and not used,
+            "error": self.error,
+        }
@@ -0,0 +1,130 @@
+# self_consistency.py
+# task 하나에 trajectory K개를 동시에 돌리고, 정규화한 최종 답으로 다수결.
+# quorum 개가 같은 답에 도달하면 바로 결과를 돌려주고, 시작 전인 sample은 취소, 실행 중인 trajectory는
+# cancel event로 다음 step 경계에서 멈춘다 (끝나기를 기다리지 않는다).
+# 도구 결과는 tool registry의 future 캐시를 공유하므로 같은 python_exec / xlsx_query는 한 번만 실행된다.
+
+import re
+import time
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+from scheduler import Speculation
+
+_NUM_RE = re.compile(r"^[-+]?\$?\d[\d,]*(\.\d+)?$")
+
+
+def normalize_answer(answer):
+    if answer is None:
+        return None
+    text = " ".join(str(answer).strip().split()).lower()
+    text = text.strip("\"'`").rstrip(".").strip()
+    if not text:
+        return None
+    if _NUM_RE.match(text):
+        num = float(text.replace("$", "").replace(",", ""))
+        return str(int(num)) if num.is_integer() else repr(num)
+    return text
+
+
+def default_quorum(samples):
+    return samples // 2 + 1
+
+
+def run_self_consistency(
+    agent,
+    task_id,
+    question,
+    file_name,
+    base_dir=".",
+    run_id=0,
+    samples=3,
+    quorum=None,
+    pending=None,
+):
+    # pending: 리스트를 주면 quorum 이후에도 아직 멈추지 않은 sample의 future를 담아 둔다.
+    #          호출한 쪽은 sink / bank를 닫기 전에 이것들이 끝나기를 기다린다.
+    if quorum is None:
+        quorum = default_quorum(samples)
+    cancel = threading.Event()
+    t_start = time.perf_counter()
+    # 추측 실행은 sample마다가 아니라 task당 한 번만
+    speculation = Speculation(Path(base_dir) / file_name) if agent.speculate else None
+    pool = ThreadPoolExecutor(max_workers=samples, thread_name_prefix="sample")
+
+    # sample i 는 run_id * samples + i 로 저장해 run_id 별 trajectory 파일이 겹치지 않게 한다
+    futures = [
+        pool.submit(
+            agent.run_single,
+            task_id=task_id,
+            question=question,
+            file_name=file_name,
+            base_dir=base_dir,
+            run_id=run_id * samples + i,
+            cancel=cancel,
+            speculate=False,
+        )
+        for i in range(samples)
+    ]
+
+    votes = Counter()
+    first_log = {}
+    winner = None
+    logs = []
+    for fut in as_completed(futures):
+        log = fut.result()
+        logs.append(log)
+        key = normalize_answer(log["final_answer"])
+        if key is None:
+            continue
+        votes[key] += 1
+        first_log.setdefault(key, log)
+        if votes[key] >= quorum:
+            winner = key
+            break
+
+    # quorum에 도달했으면 남은 sample을 기다리지 않는다
+    cancel.set()
+    unfinished = [f for f in futures if not f.done() and not f.cancel()]
+    pool.shutdown(wait=False)
+    if pending is not None:
+        pending.extend(unfinished)
+
+    quorum_reached = winner is not None
+    if winner is None and votes:
+        # quorum에 못 미치면 최다 득표 (동률이면 먼저 끝난 답)
+        winner = votes.most_common(1)[0][0]
+    chosen = first_log.get(winner)
+
+    logs.sort(key=lambda log: log["run_id"])
+    combined = {
+        "task_id": task_id,
+        "mode": agent.mode,
+        "run_id": run_id,
+        "question": question,
+        "file_name": file_name,
+        "final_answer": chosen["final_answer"] if chosen else None,
+        "judgment": "answered" if chosen else "failed",
+        "wall_ms": round((time.perf_counter() - t_start) * 1000.0, 3),
+        "votes": dict(votes),
+        "quorum": quorum,
+        "quorum_reached": quorum_reached,
+        # quorum 시점에 아직 실행 중이라 결과에 포함되지 않은 sample 수
+        "unfinished": len(unfinished),
+        "samples": [
+            {
+                "run_id": log["run_id"],
+                "final_answer": log["final_answer"],
+                "judgment": log["judgment"],
+                "wall_ms": log["wall_ms"],
+            }
+            for log in logs
+        ],
+        # 모든 sample의 step을 합쳐 두어야 metrics 요약에 실제 비용이 잡힌다
+        "trajectory": [dict(entry, sample=log["run_id"]) for log in logs for entry in log["trajectory"]],
+    }
+    if speculation is not None:
+        combined["speculation"] = speculation.finish()
+    return combined
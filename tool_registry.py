@@ -0,0 +1,255 @@
+# tool_registry.py
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from tools import clear_workbook_cache, python_exec, xlsx_query
+
+
+class Tool:
+    def __init__(
+        self,
+        name,
+        params,
+        description,
+        executor,
+        parser=None,
+        path_of=None,
+        cost_class="cpu",
+        cacheable=False,
+        timeout=60,
+    ):
+        self.name = name
+        self.params = list(params)
+        self.description = description
+        self.executor = executor
+        self.parser = parser
+        self.path_of = path_of
+        self.cost_class = cost_class
+        self.cacheable = cacheable
+        self.timeout = timeout
+
+    @property
+    def signature(self):
+        return "%s(%s)" % (self.name, ", ".join(self.params))
+
+    @property
+    def action_form(self):
+        return "%s(%s)" % (self.name, ", ".join('"<%s>"' % p for p in self.params))
+
+    def parse(self, args):
+        if len(args) != len(self.params):
+            return None
+        if self.parser is not None:
+            return self.parser(args)
+        return dict(zip(self.params, args))
+
+    def cache_key(self, tool_input):
+        # 같은 입력이라도 파일이 바뀌면 다시 실행되도록 mtime을 키에 포함
+        mtime = None
+        if self.path_of is not None:
+            try:
+                mtime = os.path.getmtime(self.path_of(tool_input))
+            except (OSError, TypeError, KeyError):
+                mtime = None
+        return (self.name, json.dumps(tool_input, ensure_ascii=False, sort_keys=True), mtime)
+
+
+def _is_error(result):
+    return isinstance(result, dict) and "error" in result
+
+
+class ToolRegistry:
+    # 결과 캐시는 프로세스 전체가 공유하므로 최근에 쓴 cache_size 개만 유지 (LRU)
+    # cache key -> {"future", "hits": 다른 호출이 재사용한 횟수}
+    def __init__(self, max_workers=None, cache_size=256):
+        self.tools = {}
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        n = max_workers or (os.cpu_count() or 2)
+        self._pools = {
+            "cpu": ThreadPoolExecutor(max_workers=n, thread_name_prefix="tool-cpu"),
+            "io": ThreadPoolExecutor(max_workers=n * 4, thread_name_prefix="tool-io"),
+        }
+
+    def register(self, tool):
+        if tool.cost_class not in self._pools:
+            raise ValueError("unknown cost class: %s" % tool.cost_class)
+        self.tools[tool.name] = tool
+        return tool
+
+    def get(self, name):
+        return self.tools.get(name)
+
+    def render_tool_docs(self):
+        lines = []
+        for i, tool in enumerate(self.tools.values(), start=1):
+            lines.append("%d) %s: %s" % (i, tool.signature, tool.description))
+        return "\n".join(lines)
+
+    def render_action_forms(self, indent="    "):
+        return "\n".join("%sAction: %s" % (indent, t.action_form) for t in self.tools.values())
+
+    def bind(self, name, args):
+        # 파싱된 호출 (이름, 인자 리스트) -> {"tool", "input"}. 등록되지 않은 도구나 인자 수가 틀리면 None
+        tool = self.tools.get(name)
+        if tool is None:
+            return None
+        tool_input = tool.parse(args)
+        if tool_input is None:
+            return None
+        return {"tool": tool.name, "input": tool_input}
+
+    def _run(self, tool, tool_input):
+        try:
+            return tool.executor(tool_input)
+        except Exception as e:
+            return {"error": type(e).__name__, "message": str(e)}
+
+    def _entry(self, tool, tool_input, count_hit=True):
+        # -> (cache entry, cache_hit, cache_key). 캐시하지 않는 도구는 cache_key가 None
+        if not tool.cacheable:
+            fut = self._pools[tool.cost_class].submit(self._run, tool, tool_input)
+            return {"future": fut, "hits": 0}, False, None
+
+        key = tool.cache_key(tool_input)
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                if count_hit:
+                    entry["hits"] += 1
+                self._cache.move_to_end(key)
+                return entry, True, key
+            fut = self._pools[tool.cost_class].submit(self._run, tool, tool_input)
+            entry = {"future": fut, "hits": 0}
+            self._cache[key] = entry
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        # 에러 결과는 캐시에 남기지 않아 다음 호출에서 다시 실행한다 (이미 끝난 future면 여기서 바로 호출됨)
+        fut.add_done_callback(lambda f: self._drop_failed(key, f))
+        return entry, False, key
+
+    def _submit(self, tool, tool_input):
+        # -> (future, cache_hit, cache_key)
+        entry, hit, key = self._entry(tool, tool_input)
+        return entry["future"], hit, key
+
+    def prefetch(self, tool_name, tool_input):
+        # 미리 실행해서 결과를 캐시에 올린다 (추측 실행용). 재사용 횟수에는 넣지 않는다.
+        # -> (cache entry, 이 호출이 실행을 시작했는지). 캐시하지 않는 도구는 (None, False)
+        tool = self.tools.get(tool_name)
+        if tool is None or not tool.cacheable:
+            return None, False
+        entry, hit, key = self._entry(tool, tool_input, count_hit=False)
+        self._result(tool, entry["future"], key)
+        return entry, not hit
+
+    def _drop_failed(self, key, fut):
+        if fut.cancelled() or _is_error(fut.result()):
+            self._forget(key, fut)
+
+    def _forget(self, key, fut):
+        if key is None:
+            return
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and entry["future"] is fut:
+                del self._cache[key]
+
+    def execute(self, tool_name, tool_input, info=None):
+        tool = self.tools.get(tool_name)
+        if tool is None:
+            return {"error": "unknown_tool"}
+        fut, hit, key = self._submit(tool, tool_input)
+        if info is not None:
+            info["cache_hit"] = hit
+        return self._result(tool, fut, key)
+
+    def execute_many(self, calls, info=None):
+        # 한 턴의 여러 Action을 모두 먼저 제출한 뒤 결과를 모은다 (서로 독립적인 호출은 병렬로 실행됨)
+        pending = []
+        for tool_name, tool_input in calls:
+            tool = self.tools.get(tool_name)
+            if tool is None:
+                pending.append((None, None, False, None))
+                continue
+            pending.append((tool,) + self._submit(tool, tool_input))
+        if info is not None:
+            info["cache_hits"] = [hit for _, _, hit, _ in pending]
+        # timeout은 제출 시점 기준 (앞의 결과를 기다린 시간만큼 뒤 호출의 제한 시간이 늘어나지 않게)
+        start = time.monotonic()
+        return [
+            {"error": "unknown_tool"} if tool is None else self._result(tool, fut, key, start)
+            for tool, fut, _, key in pending
+        ]
+
+    def _result(self, tool, fut, key=None, start=None):
+        timeout = tool.timeout
+        if start is not None and timeout is not None:
+            timeout = max(0.0, start + tool.timeout - time.monotonic())
+        try:
+            return fut.result(timeout=timeout)
+        except FutureTimeout:
+            # 시간 초과된 future를 다음 호출이 그대로 받지 않도록 캐시에서 뺀다
+            self._forget(key, fut)
+            return {"error": "timeout", "message": "%s exceeded %ss" % (tool.name, tool.timeout)}
+
+    def clear_cache(self):
+        # 도구 결과뿐 아니라 xlsx_query가 쓰는 파싱된 workbook 캐시도 비운다 (cold cache 측정용)
+        with self._lock:
+            self._cache.clear()
+        clear_workbook_cache()
+
+
+# python_exec은 기본적으로 기존처럼 제한 시간 없이 실행하고 캐시하지 않는다.
+# 스크립트가 시간 / 난수 / 파일 시스템에 의존할 수 있으므로 캐시는 configure_python_exec(cache=True)로만 켠다.
+PYTHON_EXEC_TIMEOUT = None
+XLSX_QUERY_TIMEOUT = 120
+
+REGISTRY = ToolRegistry()
+
+REGISTRY.register(
+    Tool(
+        name="python_exec",
+        params=["path"],
+        description="execute a Python script and extract the final numeric output.",
+        executor=lambda p: python_exec(p, timeout=PYTHON_EXEC_TIMEOUT),
+        parser=lambda args: args[0],
+        path_of=lambda p: p,
+        cost_class="io",
+        cacheable=False,
+        timeout=PYTHON_EXEC_TIMEOUT,
+    )
+)
+
+REGISTRY.register(
+    Tool(
+        name="xlsx_query",
+        params=["path", "query"],
+        description="query an Excel spreadsheet and compute useful aggregates.",
+        executor=lambda inp: xlsx_query(inp["path"], inp["query"]),
+        path_of=lambda inp: inp["path"],
+        cost_class="cpu",
+        cacheable=True,
+        timeout=XLSX_QUERY_TIMEOUT,
+    )
+)
+
+
+def configure_python_exec(timeout=None, cache=False):
+    # runner의 --python_exec_timeout / --cache_python_exec
+    tool = REGISTRY.get("python_exec")
+    # subprocess는 timeout에 죽이고, 결과 대기는 그보다 조금 길게 (subprocess가 먼저 정리되도록)
+    tool.executor = lambda p: python_exec(p, timeout=timeout)
+    tool.timeout = None if timeout is None else timeout + 5
+    tool.cacheable = cache
+    return tool
+
+
+def register_tool(tool):
+    return REGISTRY.register(tool)
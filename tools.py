@@ -1,11 +1,14 @@
 import subprocess
 import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
 from pathlib import Path
 
-import pandas as pd
+# pandas는 import 비용이 커서(수백 ms) xlsx를 실제로 읽을 때 가져온다.
 
 
-def python_exec(path):
+def python_exec(path, timeout=None):
     script_path = Path(path)
 
     if not script_path.exists():
@@ -14,7 +17,8 @@ def python_exec(path):
     result = subprocess.run(
         ["python", str(script_path)],
         capture_output=True,
-        text=True
+        text=True,
+        timeout=timeout,
     )
 
     stdout = result.stdout
@@ -33,6 +37,8 @@ def python_exec(path):
 
 
 def _load_all_sheets(path):
+    import pandas as pd
+
     xls = pd.ExcelFile(path)
     dfs = []
     for sheet_name in xls.sheet_names:
@@ -42,16 +48,66 @@ def _load_all_sheets(path):
     return dfs
 
 
+# 파싱된 workbook 캐시: (절대경로, mtime) -> {"future": sheet DataFrame 리스트의 Future, "hits": 재사용 횟수}
+# 파싱 중인 workbook도 캐시에 있으므로 같은 파일을 동시에 요청한 쪽은 다시 파싱하지 않고 그 결과를 기다린다.
+WORKBOOK_CACHE_SIZE = 8
+_workbook_cache = OrderedDict()
+_workbook_lock = threading.Lock()
+
+
+def workbook_entry(path, count_hit=True):
+    # -> (캐시 entry, 이 호출이 파싱했는지). 결과가 준비될 때까지 기다린다.
+    # count_hit=False면 미리 읽기(prefetch / 추측 실행)라서 재사용 횟수에 넣지 않는다.
+    p = Path(path).resolve()
+    key = (str(p), p.stat().st_mtime)
+    with _workbook_lock:
+        entry = _workbook_cache.get(key)
+        created = entry is None
+        if created:
+            entry = {"future": Future(), "hits": 0}
+            _workbook_cache[key] = entry
+            while len(_workbook_cache) > WORKBOOK_CACHE_SIZE:
+                _workbook_cache.popitem(last=False)
+        else:
+            if count_hit:
+                entry["hits"] += 1
+            _workbook_cache.move_to_end(key)
+
+    if created:
+        try:
+            entry["future"].set_result(_load_all_sheets(p))
+        except BaseException as e:
+            # 실패한 파싱은 캐시에 남기지 않는다 (기다리던 쪽에는 같은 예외가 전달됨)
+            with _workbook_lock:
+                if _workbook_cache.get(key) is entry:
+                    del _workbook_cache[key]
+            entry["future"].set_exception(e)
+            raise
+    entry["future"].result()
+    return entry, created
+
+
+def load_workbook(path):
+    return workbook_entry(path)[0]["future"].result()
+
+
+def clear_workbook_cache():
+    with _workbook_lock:
+        _workbook_cache.clear()
+
+
 def _normalize_colname(col):
     return col.strip().lower().replace(" ", "_").replace("/", "_")
 
 
 def xlsx_query(path, query):
+    import pandas as pd
+
     excel_path = Path(path)
     if not excel_path.exists():
         raise FileNotFoundError("엑셀 파일을 찾을 수 없습니다: %s" % path)
 
-    dfs = _load_all_sheets(excel_path)
+    dfs = load_workbook(excel_path)
     q = query.lower()
 
     result = {
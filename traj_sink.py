@@ -0,0 +1,204 @@
+# traj_sink.py
+# trajectory 로그 저장소.
+# - PerTaskJsonSink: 기존 runs/{task_id}/{mode}_{run_id}.json 레이아웃
+# - JsonlTrajSink: run 단위 JSONL 한 파일 (gzip/zstd 선택), 백그라운드 writer 스레드 + 큰 observation 중복 제거
+
+import os
+import gzip
+import hashlib
+import json
+import queue
+import argparse
+import threading
+from pathlib import Path
+
+
+class PerTaskJsonSink:
+    def __init__(self, runs_dir="runs"):
+        self.runs_dir = Path(runs_dir)
+
+    def write(self, log_obj):
+        out_dir = self.runs_dir / str(log_obj["task_id"])
+        out_dir.mkdir(parents=True, exist_ok=True)
+        path = out_dir / ("%s_%d.json" % (log_obj["mode"], log_obj["run_id"]))
+        with path.open("w", encoding="utf-8") as f:
+            json.dump(log_obj, f, ensure_ascii=False, indent=2)
+
+    def close(self):
+        pass
+
+
+def _open_text(path, mode, compress):
+    if compress is None:
+        return open(path, mode + "t", encoding="utf-8")
+    if compress == "gzip":
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    if compress == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError("zstd compression requires the 'zstandard' package.")
+        import io
+        if mode == "r":
+            raw = zstandard.ZstdDecompressor().stream_reader(open(path, "rb"))
+        else:
+            raw = zstandard.ZstdCompressor().stream_writer(open(path, mode + "b"))
+        return io.TextIOWrapper(raw, encoding="utf-8")
+    raise ValueError("unknown compression: %s" % compress)
+
+
+def _guess_compress(path):
+    name = str(path)
+    if name.endswith(".gz"):
+        return "gzip"
+    if name.endswith(".zst"):
+        return "zstd"
+    return None
+
+
+def _dumps(obj):
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+def _salvage(path, compress):
+    # 중단된 run의 파일에서 끝까지 온전한 레코드만 골라 다시 쓴다.
+    # (잘린 gzip member나 쓰다 만 마지막 줄 뒤에 이어 쓰면 파일 전체를 읽을 수 없게 된다)
+    lines = []
+    try:
+        with _open_text(path, "r", compress) as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    break
+                json.loads(line)
+                lines.append(line)
+    except Exception:
+        pass
+    tmp = Path(str(path) + ".tmp")
+    with _open_text(tmp, "w", compress) as f:
+        f.writelines(lines)
+    os.replace(tmp, path)
+    return [json.loads(line)["hash"] for line in lines if line.startswith('{"type":"blob"')]
+
+
+class JsonlTrajSink:
+    # append=False면 같은 경로의 이전 파일을 덮어쓴다 (같은 run_id로 다시 돌려도 레코드가 중복되지 않게).
+    # --resume 일 때만 append=True로 이전 레코드 뒤에 이어 쓴다.
+    def __init__(self, path, compress="auto", dedup_min_bytes=1024, max_queue=1024, append=False):
+        self.path = Path(path)
+        self.compress = _guess_compress(self.path) if compress == "auto" else compress
+        self.dedup_min_bytes = dedup_min_bytes
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._seen = set()
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._error = None
+        if append and self.path.exists():
+            # 이미 기록된 blob은 다시 쓰지 않는다
+            self._seen.update(_salvage(self.path, self.compress))
+        # gzip/zstd 스트림은 이어쓰기 시 새 frame/member로 붙으므로 append로 열어도 읽을 수 있다.
+        self._f = _open_text(self.path, "a" if append else "w", self.compress)
+        self._thread = threading.Thread(target=self._writer, name="traj-sink", daemon=True)
+        self._thread.start()
+
+    def write(self, log_obj):
+        if self._error is not None:
+            raise self._error
+        self._queue.put(log_obj)
+
+    def _encode(self, log_obj):
+        lines = []
+        steps = []
+        for step_log in log_obj.get("trajectory", []):
+            obs = step_log.get("observation")
+            if obs is not None:
+                data = _dumps(obs)
+                if len(data) >= self.dedup_min_bytes:
+                    h = hashlib.sha1(data.encode("utf-8")).hexdigest()
+                    if h not in self._seen:
+                        self._seen.add(h)
+                        lines.append('{"type":"blob","hash":"%s","data":%s}' % (h, data))
+                    step_log = dict(step_log, observation={"$ref": h})
+            steps.append(step_log)
+        rec = dict(log_obj, trajectory=steps, type="traj")
+        lines.append(_dumps(rec))
+        return "\n".join(lines) + "\n"
+
+    def _writer(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    break
+                self._f.write(self._encode(item))
+            except Exception as e:
+                self._error = e
+            finally:
+                self._queue.task_done()
+        self._f.close()
+
+    def flush(self):
+        self._queue.join()
+        if self._error is not None:
+            raise self._error
+
+    def close(self):
+        if not self._thread.is_alive():
+            return
+        self._queue.put(None)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+
+def open_sink(kind="per_task", runs_dir="runs", traj_path=None, compress="auto", resume=False):
+    if kind == "per_task":
+        return PerTaskJsonSink(runs_dir)
+    if kind == "jsonl":
+        if traj_path is None:
+            traj_path = str(Path(runs_dir) / "trajectories.jsonl")
+        return JsonlTrajSink(traj_path, compress=compress, append=resume)
+    raise ValueError("unknown trajectory sink: %s" % kind)
+
+
+def iter_trajectories(path, compress="auto"):
+    if compress == "auto":
+        compress = _guess_compress(path)
+    blobs = {}
+    with _open_text(path, "r", compress) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            rec = json.loads(line)
+            if rec.get("type") == "blob":
+                blobs[rec["hash"]] = rec["data"]
+                continue
+            rec.pop("type", None)
+            for step_log in rec.get("trajectory", []):
+                obs = step_log.get("observation")
+                if isinstance(obs, dict) and set(obs) == {"$ref"}:
+                    step_log["observation"] = blobs[obs["$ref"]]
+            yield rec
+
+
+def export_per_task(path, out_dir="runs", compress="auto"):
+    sink = PerTaskJsonSink(out_dir)
+    n = 0
+    for rec in iter_trajectories(path, compress=compress):
+        sink.write(rec)
+        n += 1
+    return n
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=["export"])
+    parser.add_argument("path", type=str)
+    parser.add_argument("--out_dir", type=str, default="runs")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    n = export_per_task(args.path, args.out_dir)
+    print("exported %d trajectories to %s" % (n, args.out_dir))